@@ -0,0 +1,386 @@
+"""
+Streaming GIF Animation
+流式解码的 GIF 动画 - 按需解码帧, 只保留有限数量的 CTkImage;
+预缩放后的帧保存在磁盘缓存中, 之后启动直接映射读取, 无需解码。
+
+清空缓存: python animated_gif.py --clear-cache
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import customtkinter as ctk
+from PIL import Image
+
+from morandi.diskcache import DiskCache
+from morandi.export import atomic_write
+from morandi.paths import user_cache_dir
+
+
+def default_cache_dir():
+    """帧缓存目录"""
+    return user_cache_dir("animated_gif_cache")
+
+
+class FrameSheet:
+    """映射到内存的帧精灵图, 帧直接引用映射内存"""
+    MAGIC = b"AGIF\x01"
+    HEADER = struct.Struct("<5sHHI")  # 标识, 宽, 高, 帧数
+    
+    def __init__(self, mapped):
+        magic, width, height, count = self.HEADER.unpack_from(mapped, 0)
+        if magic != self.MAGIC:
+            raise ValueError("不是有效的帧缓存文件")
+        self.mapped = mapped
+        self.size = (width, height)
+        self.frame_count = count
+        self.durations = list(struct.unpack_from(f"<{count}I", mapped, self.HEADER.size))
+        self.offset = self.HEADER.size + 4 * count
+        self.frame_bytes = width * height * 4
+        if len(mapped) != self.offset + count * self.frame_bytes:
+            raise ValueError("帧缓存文件不完整")
+    
+    def frame(self, index):
+        """取出一帧 (RGBA), 不复制像素数据"""
+        start = self.offset + index * self.frame_bytes
+        data = memoryview(self.mapped)[start:start + self.frame_bytes]
+        return Image.frombuffer("RGBA", self.size, data, "raw", "RGBA", 0, 1)
+    
+    @classmethod
+    def write(cls, file, size, frames, durations):
+        file.write(cls.HEADER.pack(cls.MAGIC, size[0], size[1], len(frames)))
+        file.write(struct.pack(f"<{len(durations)}I", *durations))
+        for frame in frames:
+            file.write(frame.tobytes())
+
+
+class FrameCache(DiskCache):
+    """预缩放 GIF 帧的磁盘缓存
+    
+    以 (文件内容哈希, 目标尺寸, 缩放滤镜) 为键, 每个键一个文件;
+    总大小超过 max_bytes 时按最近使用时间淘汰。
+    """
+    SUFFIX = ".frames"
+    
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        super().__init__(directory or default_cache_dir(), max_bytes)
+    
+    def key(self, gif_path, size, resample):
+        digest = hashlib.sha1()
+        with open(gif_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"{digest.hexdigest()}-{size[0]}x{size[1]}-{resample}"
+    
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+    
+    def load(self, key):
+        """映射缓存文件, 不存在或已损坏时返回 None"""
+        path = self.path_for(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            sheet = FrameSheet(mapped)
+        except (ValueError, struct.error):
+            mapped.close()
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)  # 记录最近使用时间, 供淘汰使用
+        except OSError:
+            pass
+        return sheet
+    
+    def store(self, key, size, frames, durations):
+        """原子写入一组帧, 然后按容量淘汰旧文件"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with atomic_write(self.path_for(key)) as f:
+                FrameSheet.write(f, size, frames, durations)
+        except OSError as e:
+            print(f"写入GIF帧缓存失败: {e}")
+            return
+        self.evict()
+
+
+class AnimationClock:
+    """同一窗口内所有动画共用的时钟
+    
+    只有一条 after() 链: 每次 tick 按经过的时间推进所有已注册的动画,
+    帧切换的 configure() 集中在同一个回调里完成, Tk 只需一次重绘。
+    控件不可见或窗口最小化时暂停对应动画。
+    """
+    MIN_INTERVAL = 10    # 两次 tick 的最短间隔 (毫秒)
+    IDLE_INTERVAL = 250  # 所有动画都暂停时的检查间隔 (毫秒)
+    
+    _clocks = {}
+    
+    @classmethod
+    def for_widget(cls, widget):
+        """获取控件所在窗口的时钟"""
+        toplevel = widget.winfo_toplevel()
+        clock = cls._clocks.get(toplevel)
+        if clock is None:
+            clock = cls._clocks[toplevel] = cls(toplevel)
+        return clock
+    
+    def __init__(self, window):
+        self.window = window
+        self.animations = []
+        self.after_id = None
+        self.tick_count = 0
+        self.last_tick_ms = 0.0
+        self.max_tick_ms = 0.0
+        self.total_tick_ms = 0.0
+    
+    def register(self, animation):
+        if animation not in self.animations:
+            self.animations.append(animation)
+        if self.after_id is None:
+            self.after_id = self.window.after(0, self._tick)
+    
+    def unregister(self, animation):
+        if animation in self.animations:
+            self.animations.remove(animation)
+        if not self.animations:
+            if self.after_id is not None:
+                self.window.after_cancel(self.after_id)
+                self.after_id = None
+            self._clocks.pop(self.window, None)
+    
+    def _is_visible(self, animation):
+        try:
+            return bool(animation.label.winfo_viewable())
+        except Exception:
+            return False
+    
+    def _tick(self):
+        start = time.perf_counter()
+        iconic = self.window.state() == "iconic"
+        next_due = None
+        for animation in list(self.animations):
+            if iconic or not self._is_visible(animation):
+                animation.pause()
+                continue
+            animation.advance(start)
+            if next_due is None or animation.next_frame_time < next_due:
+                next_due = animation.next_frame_time
+        
+        now = time.perf_counter()
+        self.last_tick_ms = (now - start) * 1000
+        self.max_tick_ms = max(self.max_tick_ms, self.last_tick_ms)
+        self.total_tick_ms += self.last_tick_ms
+        self.tick_count += 1
+        
+        if not self.animations:
+            # 最后一个动画在本次 tick 中注销 (例如解码失败), 时钟随之停止
+            self.after_id = None
+            return
+        if next_due is None:
+            delay = self.IDLE_INTERVAL
+        else:
+            delay = max(self.MIN_INTERVAL, int((next_due - now) * 1000))
+        self.after_id = self.window.after(delay, self._tick)
+    
+    def stats(self):
+        """每次 tick 的耗时统计 (毫秒)"""
+        return {
+            "animations": len(self.animations),
+            "ticks": self.tick_count,
+            "last_ms": self.last_tick_ms,
+            "max_ms": self.max_tick_ms,
+            "avg_ms": self.total_tick_ms / self.tick_count if self.tick_count else 0.0,
+        }
+
+
+class AnimatedGIF:
+    """处理GIF动画的类 - 流式解码, 支持CTkImage以获得更好的HighDPI支持
+    
+    构造时只读取文件头; 帧由后台线程按播放顺序提前解码 prefetch 帧,
+    已显示过的帧以 CTkImage 形式保存在容量为 cache_size 的 LRU 中。
+    第一轮解码完成后写入磁盘缓存, 之后启动直接从缓存映射读取。
+    播放由同一窗口共用的 AnimationClock 驱动。
+    """
+    RESAMPLE = "lanczos-rg3" # 缩放方式, 参与缓存键; 修改 _decode_frame 时需同步修改
+    RESYNC_AFTER = 1.0       # 落后超过该秒数时重新对齐时间线
+    
+    def __init__(self, label, gif_path, size=(80, 80), cache_size=32, prefetch=4, use_cache=True):
+        self.label = label
+        self.gif_path = gif_path
+        self.size = size
+        self.cache_size = cache_size
+        self.prefetch = prefetch
+        self.frames = OrderedDict()   # 帧序号 -> CTkImage (LRU)
+        self.ready = {}               # 帧序号 -> 已解码、尚未包装的 PIL 帧
+        self.durations = {}
+        self.frame_count = 0
+        self.current_frame = 0
+        self.is_playing = False
+        self.closed = False
+        self.next_frame_time = None   # 下一帧的计划显示时间 (perf_counter 秒)
+        self.decoder = None
+        self.condition = threading.Condition()
+        self.gif = None
+        self.sheet = None             # 命中磁盘缓存时的帧精灵图
+        self.frame_cache = FrameCache() if use_cache else None
+        self.cache_key = None
+        self.recorded = {}            # 第一轮解码的帧, 完整后写入磁盘缓存
+        
+        try:
+            if self.frame_cache:
+                self.cache_key = self.frame_cache.key(gif_path, size, self.RESAMPLE)
+                self.sheet = self.frame_cache.load(self.cache_key)
+            if self.sheet:
+                self.frame_count = self.sheet.frame_count
+                self.durations = dict(enumerate(self.sheet.durations))
+            else:
+                # 只解析文件头, 帧数据在后台线程中解码
+                self.gif = Image.open(gif_path)
+                self.frame_count = getattr(self.gif, "n_frames", 1)
+        except Exception as e:
+            print(f"加载GIF失败: {e}")
+            self.gif = None
+            self.frame_count = 0
+    
+    def _decode_frame(self, index):
+        """解码并缩放一帧 (后台线程)"""
+        self.gif.seek(index)
+        duration = self.gif.info.get('duration', 100)
+        frame = self.gif.convert("RGBA").resize(self.size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        return frame, duration if duration > 0 else 100
+    
+    def _next_needed(self):
+        """播放位置之后 prefetch 帧内第一个尚未解码的帧"""
+        for offset in range(min(self.prefetch, self.frame_count)):
+            index = (self.current_frame + offset) % self.frame_count
+            if index not in self.frames and index not in self.ready:
+                return index
+        return None
+    
+    def _decode_loop(self):
+        """后台预解码线程"""
+        while True:
+            with self.condition:
+                index = self._next_needed()
+                while not self.closed and index is None:
+                    self.condition.wait()
+                    index = self._next_needed()
+                if self.closed:
+                    return
+            try:
+                frame, duration = self._decode_frame(index)
+            except Exception as e:
+                print(f"加载GIF失败: {e}")
+                with self.condition:
+                    self.closed = True
+                return
+            with self.condition:
+                self.ready[index] = frame
+                self.durations[index] = duration
+            self._record(index, frame, duration)
+    
+    def _record(self, index, frame, duration):
+        """收集第一轮解码的帧, 集齐后写入磁盘缓存 (后台线程)"""
+        if self.recorded is None or not self.cache_key:
+            return
+        self.recorded[index] = (frame, duration)
+        if len(self.recorded) == self.frame_count:
+            frames = [self.recorded[i][0] for i in range(self.frame_count)]
+            durations = [self.recorded[i][1] for i in range(self.frame_count)]
+            self.recorded = None
+            self.frame_cache.store(self.cache_key, self.size, frames, durations)
+    
+    def _frame_image(self, index):
+        """取出一帧的 CTkImage, 尚未解码完成时返回 None (主线程)"""
+        with self.condition:
+            image = self.frames.get(index)
+            if image is not None:
+                self.frames.move_to_end(index)
+                return image
+            frame = self.ready.pop(index, None)
+        if frame is None and self.sheet:
+            frame = self.sheet.frame(index)
+        if frame is None:
+            return None
+        
+        image = ctk.CTkImage(light_image=frame, dark_image=frame, size=self.size)
+        with self.condition:
+            self.frames[index] = image
+            while len(self.frames) > self.cache_size:
+                self.frames.popitem(last=False)
+        return image
+    
+    def _frame_available(self, index):
+        return self.sheet is not None or index in self.frames or index in self.ready
+    
+    def advance(self, now):
+        """由动画时钟调用: 按经过的时间推进到此刻应显示的帧 (主线程)"""
+        if self.closed:
+            # 后台解码失败: 从时钟注销, 否则时钟会一直以最短间隔空转
+            self.stop()
+            return
+        if self.next_frame_time is None or now - self.next_frame_time > self.RESYNC_AFTER:
+            # 首帧、恢复播放或严重卡顿后重新对齐, 避免快进
+            self.next_frame_time = now
+        
+        due = None
+        while now >= self.next_frame_time:
+            if not self._frame_available(self.current_frame):
+                # 等待后台解码, 不累积延迟
+                self.next_frame_time = now
+                break
+            if due is not None:
+                # 追赶时跳过的帧不会再显示, 从 ready 中丢弃, 避免堆积或稍后乱序显示
+                with self.condition:
+                    self.ready.pop(due, None)
+            due = self.current_frame
+            # 以计划时间而非当前时间累加, 多个动画之间不会漂移
+            self.next_frame_time += self.durations.get(due, 100) / 1000
+            with self.condition:
+                self.current_frame = (self.current_frame + 1) % self.frame_count
+                self.condition.notify()
+        
+        if due is not None:
+            self.label.configure(image=self._frame_image(due))
+    
+    def pause(self):
+        """由动画时钟在控件隐藏或窗口最小化时调用"""
+        self.next_frame_time = None
+    
+    def start(self):
+        if self.frame_count and not self.closed:
+            if self.decoder is None and not self.sheet:
+                self.decoder = threading.Thread(target=self._decode_loop, name="gif-decoder", daemon=True)
+                self.decoder.start()
+            self.is_playing = True
+            self.next_frame_time = None
+            AnimationClock.for_widget(self.label).register(self)
+    
+    def stop(self):
+        self.is_playing = False
+        AnimationClock.for_widget(self.label).unregister(self)
+    
+    def close(self):
+        """停止播放并结束后台解码线程"""
+        self.stop()
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+if __name__ == "__main__":
+    if "--clear-cache" in sys.argv:
+        cache = FrameCache()
+        print(f"已删除 {cache.clear()} 个缓存文件: {cache.directory}")
+    else:
+        print(__doc__)
@@ -0,0 +1,77 @@
+"""
+颜色引擎基准测试
+对比旧的逐步处理链 (ImageEnhance + split/point/merge) 与编译后的 ColorTransform
+
+用法: python benchmarks/bench_color_engine.py [图片路径 ...]
+"""
+
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops, ImageEnhance
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from morandi.core import (  # noqa: E402
+    STATS_SAMPLE_SIZE, MorandiFilters, compile_transform, make_preview_proxy
+)
+
+
+def legacy_chain(image, params, brightness, contrast, saturation):
+    """旧实现: 每个步骤都是一次或多次整图处理"""
+    r_shift, g_shift, b_shift, filter_saturation = params
+    img = ImageEnhance.Color(image).enhance(filter_saturation)
+    r, g, b = img.split()
+    r = r.point(lambda x: min(255, x + r_shift))
+    g = g.point(lambda x: min(255, x + g_shift))
+    b = b.point(lambda x: min(255, x + b_shift))
+    img = Image.merge('RGB', (r, g, b))
+    img = ImageEnhance.Brightness(img).enhance(brightness)
+    img = ImageEnhance.Contrast(img).enhance(contrast)
+    return ImageEnhance.Color(img).enhance(saturation)
+
+
+def best_of(func, repeat=5):
+    """取多次运行的最短耗时 (毫秒)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(name, image, repeat):
+    adjustments = (1.1, 0.9, 1.2)
+    sample = make_preview_proxy(image, (STATS_SAMPLE_SIZE, STATS_SAMPLE_SIZE))
+    for filter_name in ("ROSE", "SAGE", "LAVENDER", "DUSTY_BLUE"):
+        params = getattr(MorandiFilters, filter_name)
+        legacy_ms = best_of(lambda: legacy_chain(image, params, *adjustments), repeat)
+        # 编译只在参数变化时发生一次, 单独计时
+        compile_ms = best_of(lambda: compile_transform(params, *adjustments, sample=sample), repeat)
+        transform = compile_transform(params, *adjustments, sample=sample)
+        fused_ms = best_of(lambda: transform.apply(image), repeat)
+        expected = legacy_chain(image, params, *adjustments)
+        max_diff = max(high for _, high in ImageChops.difference(expected, transform.apply(image)).getextrema())
+        print(f"{name:<28} {filter_name:<11} 旧: {legacy_ms:8.1f} ms  新: {fused_ms:8.1f} ms "
+              f"(编译 {compile_ms:4.1f} ms)  加速: {legacy_ms / fused_ms:5.2f}x  最大误差: {max_diff}")
+
+
+def main():
+    paths = sys.argv[1:] or [
+        os.path.join(ROOT, name) for name in sorted(os.listdir(ROOT))
+        if name.lower().endswith((".png", ".jpg", ".webp"))
+    ]
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        bench(f"{os.path.basename(path)[:16]} {image.width}x{image.height}", image, repeat=5)
+    
+    # 合成的 24 MP 图片
+    synthetic = Image.effect_mandelbrot((6000, 4000), (-2, -1.25, 1, 1.25), 100).convert("RGB")
+    bench("synthetic 6000x4000", synthetic, repeat=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+显示表面基准测试
+比较每帧新建 CTkImage 与复用 PhotoImage 原地 paste 的每帧耗时和 Tk 图片分配次数
+
+需要图形界面 (Linux 下可用 xvfb-run)。
+用法: python benchmarks/bench_display_surface.py [帧数] [宽] [高]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import customtkinter as ctk  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from morandi_image_app import DisplaySurface  # noqa: E402
+
+
+def make_frames(size, count=8):
+    """几张尺寸相同、内容不同的帧, 模拟拖动滑块"""
+    base = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64).convert("RGB")
+    return [base.point(lambda value, shift=i * 16: (value + shift) % 256) for i in range(count)]
+
+
+def tk_image_count(root):
+    return len(root.tk.call("image", "names"))
+
+
+def run_ctkimage(root, label, frames, count):
+    """原来的做法: 每帧一个 CTkImage, 每次 configure 都生成新的 PhotoImage"""
+    before = tk_image_count(root)
+    allocations = 0
+    start = time.perf_counter()
+    for i in range(count):
+        frame = frames[i % len(frames)]
+        ctk_image = ctk.CTkImage(light_image=frame, dark_image=frame, size=frame.size)
+        label.configure(image=ctk_image, text="")
+        label.image = ctk_image
+        allocations += 1
+        root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    return elapsed / count * 1000, allocations, tk_image_count(root) - before
+
+
+def run_surface(root, label, frames, count):
+    surface = DisplaySurface(label)
+    before = tk_image_count(root)
+    start = time.perf_counter()
+    for i in range(count):
+        surface.show(frames[i % len(frames)])
+        root.update_idletasks()
+    elapsed = time.perf_counter() - start
+    return elapsed / count * 1000, surface.allocations, tk_image_count(root) - before
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = (int(sys.argv[2]), int(sys.argv[3])) if len(sys.argv) > 3 else (1200, 800)
+    root = ctk.CTk()
+    root.geometry(f"{size[0] + 40}x{size[1] + 40}")
+    frames = make_frames(size)
+    print(f"{count} 帧, {size[0]}x{size[1]}")
+    for name, run in (("CTkImage/帧", run_ctkimage), ("PhotoImage.paste", run_surface)):
+        label = ctk.CTkLabel(root, text="")
+        label.pack(fill="both", expand=True)
+        root.update()
+        per_frame, allocations, live = run(root, label, frames, count)
+        print(f"{name:<18} {per_frame:7.2f} ms/帧  分配 {allocations:5d}  存活 Tk 图片 +{live}")
+        label.destroy()
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+NumPy 后端基准测试与一致性检查
+与 PIL 路径 (morandi.core.apply_morandi_tone) 对比耗时, 并检查结果差异
+
+用法: python benchmarks/bench_numpy_backend.py [图片路径 ...]
+"""
+
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from morandi import numpy_backend  # noqa: E402
+from morandi.core import MorandiFilters, apply_morandi_tone  # noqa: E402
+
+# 与 PIL 路径的最大允许差异 (定点与浮点的舍入误差)
+MAX_PARITY_DIFF = 2
+
+
+def best_of(func, repeat=5):
+    """取多次运行的最短耗时 (毫秒)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def max_difference(a, b):
+    return max(high for _, high in ImageChops.difference(a, b).getextrema())
+
+
+def main():
+    if not numpy_backend.HAS_NUMPY:
+        print("未安装 numpy, 跳过")
+        return 0
+    
+    paths = sys.argv[1:] or [
+        os.path.join(ROOT, name) for name in sorted(os.listdir(ROOT)) if name.lower().endswith(".png")
+    ]
+    failures = 0
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        name = f"{os.path.basename(path)[:16]} {image.width}x{image.height}"
+        for filter_name in ("ROSE", "SAGE", "LAVENDER", "DUSTY_BLUE"):
+            params = getattr(MorandiFilters, filter_name)
+            pil_ms = best_of(lambda: apply_morandi_tone(image, *params))
+            numpy_ms = best_of(lambda: numpy_backend.apply_morandi_tone(image, *params))
+            diff = max_difference(apply_morandi_tone(image, *params), numpy_backend.apply_morandi_tone(image, *params))
+            status = "OK" if diff <= MAX_PARITY_DIFF else "不一致"
+            failures += diff > MAX_PARITY_DIFF
+            print(f"{name:<28} {filter_name:<11} PIL: {pil_ms:7.1f} ms  NumPy: {numpy_ms:7.1f} ms  "
+                  f"误差: {diff} {status}")
+        
+        # 强度与混合模式
+        for blend in numpy_backend.BLEND_MODES:
+            blend_ms = best_of(
+                lambda: numpy_backend.apply_morandi_tone(image, *MorandiFilters.SAGE, strength=0.6, blend=blend)
+            )
+            print(f"{name:<28} SAGE 60% {blend:<10} NumPy: {blend_ms:7.1f} ms")
+    
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+启动基准测试
+在全新的解释器中分别计时各个模块的导入时间, 比较处理核心与 GUI 应用的导入开销
+
+用法: python benchmarks/bench_startup.py [重复次数]
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    ("PIL.Image", "import PIL.Image"),
+    ("morandi.core", "import morandi.core"),
+    ("morandi.batch", "import morandi.batch"),
+    ("morandi_image_app", "import morandi_image_app"),
+]
+
+TIMER = """
+import time
+start = time.perf_counter()
+{statement}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def time_import(statement, repeat):
+    """返回多次冷启动导入的最短耗时 (毫秒)"""
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", TIMER.format(statement=statement)], cwd=ROOT, text=True
+        )
+        timings.append(float(output.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = None
+    for name, statement in MODULES:
+        elapsed = time_import(statement, repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<20} {elapsed:8.1f} ms  ({elapsed / baseline:4.1f}x PIL)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+视口渲染基准测试
+放大查看时平移一帧的耗时: 只渲染可见块, 与原图尺寸无关; 同时与整图渲染后裁剪的结果逐像素比较
+
+用法: python benchmarks/bench_viewport.py [帧数]
+"""
+
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from morandi.core import AdjustmentPipeline, MipChain, MorandiFilters  # noqa: E402
+from morandi.viewport import TileCache, Viewport, choose_level, render_region  # noqa: E402
+
+DISPLAY_SIZE = (1200, 800)
+SIZES = [(2000, 1500), (6000, 4000), (8660, 5774)]   # 3 MP, 24 MP, 50 MP
+
+
+def make_image(size):
+    return Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64).convert("RGB")
+
+
+def bench(size, frames):
+    image = make_image(size)
+    pyramid = MipChain(image)
+    reference = pyramid.level_for(DISPLAY_SIZE)
+    pipeline = AdjustmentPipeline()
+    pipeline.filter = MorandiFilters.ROSE
+    pipeline.contrast = 1.2
+    signature = pipeline.signature()
+    transform = pipeline.transform_for(image, reference=reference, signature=signature)
+    
+    # 1:1 结果应与整图变换后裁剪完全一致
+    viewport = Viewport(size)
+    viewport.set_zoom(1.0, DISPLAY_SIZE)
+    box, output_size = viewport.region(DISPLAY_SIZE)
+    level, level_scale = choose_level(pyramid.levels, size, 1.0)
+    actual = render_region(level, level_scale, box, output_size, transform, TileCache(), signature)
+    expected = transform.apply(image.crop(tuple(round(value) for value in box)))
+    identical = ImageChops.difference(actual, expected).getbbox() is None
+    
+    # 200% 时沿对角线平移
+    tiles = TileCache()
+    viewport.set_zoom(2.0, DISPLAY_SIZE)
+    timings = []
+    for _ in range(frames):
+        viewport.pan(-13, -7, DISPLAY_SIZE)
+        box, output_size = viewport.region(DISPLAY_SIZE)
+        level, level_scale = choose_level(pyramid.levels, size, viewport.scale(DISPLAY_SIZE))
+        start = time.perf_counter()
+        render_region(level, level_scale, box, output_size, transform, tiles, signature)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    whole_start = time.perf_counter()
+    transform.apply(image)
+    whole_ms = (time.perf_counter() - whole_start) * 1000
+    megapixels = size[0] * size[1] / 1e6
+    print(f"{megapixels:5.1f} MP  平移 p50 {timings[len(timings) // 2]:6.1f} ms  "
+          f"p95 {timings[int(len(timings) * 0.95)]:6.1f} ms  (整图渲染 {whole_ms:7.1f} ms)  "
+          f"1:1 一致: {'是' if identical else '否'}")
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    print(f"显示区域 {DISPLAY_SIZE[0]}x{DISPLAY_SIZE[1]}, 200% 平移 {frames} 帧")
+    for size in SIZES:
+        bench(size, frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+基准测试套件
+无需显示器即可运行; 每个用例在全新的解释器中执行, 分别记录耗时和峰值内存 (RSS)
+
+覆盖:
+  filter.*      各莫兰迪滤镜 (apply_morandi_tone)
+  adjust.*      亮度 / 对比度 / 饱和度 (编译后的单步变换)
+  pipeline      全部参数同时生效的 AdjustmentPipeline.render
+  display.*     预览的适应缩放 (交互帧 BILINEAR, 最终帧 LANCZOS)
+  gif.*         仓库中每个 GIF / 动态 WebP 的逐帧解码与磁盘缓存读取
+  startup.*     两个应用的冷启动导入; 有显示器时 (或在 xvfb-run 下) 另测创建窗口到首次空闲
+
+图片来源为仓库自带的 PNG / JPG / WebP 样图和若干合成尺寸 (默认最大 50 MP)。
+结果写为 JSON; 指定 --baseline 时与之对比, 任一用例中位数变慢超过容差则返回 1。
+
+用法:
+  python benchmarks/harness.py [--out results.json] [--baseline base.json]
+                               [--sizes 1,4,12,24,50] [--repeat 3] [--only 前缀] [--quick]
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.webp")
+GIF_DIRS = (ROOT, os.path.join(ROOT, "LiquidGlassApp", "Assets", "gif"))
+DEFAULT_SIZES = (1, 4, 12, 24, 50)   # 合成图片的百万像素数
+DISPLAY_BOUNDS = (1000, 700)         # 与 MorandiImageApp 默认窗口的显示区域相当
+GIF_SIZE = (55, 55)                  # 与标题栏动画尺寸一致
+STARTUP_APPS = (
+    ("morandi_image_app", "MorandiImageApp"),
+    ("liquid_glass_app", "LiquidGlassApp"),
+)
+
+
+# ========== 子进程中执行的部分 ==========
+def peak_rss_mb():
+    """当前进程的峰值 RSS (MB); 无法获取时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB, macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_image(megapixels):
+    """合成图片: 双向渐变叠加噪声 (让编码器和缩放有真实的细节), 宽高比 3:2"""
+    from PIL import Image, ImageChops
+    width = int((megapixels * 1e6 * 1.5) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    horizontal = Image.linear_gradient("L").rotate(90).resize((width, height))
+    vertical = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    red = ImageChops.add(horizontal, noise, scale=1.2)
+    return Image.merge("RGB", (red, vertical, ImageChops.blend(horizontal, vertical, 0.5)))
+
+
+def load_source(source):
+    from PIL import Image
+    if source.startswith("synthetic:"):
+        return synthetic_image(float(source.split(":", 1)[1]))
+    with Image.open(os.path.join(ROOT, source)) as image:
+        return image.convert("RGB")
+
+
+def image_case(name, image):
+    """返回 image 上某个用例的无参函数"""
+    from morandi.core import (
+        STATS_SAMPLE_SIZE, AdjustmentPipeline, MipChain, MorandiFilters,
+        apply_morandi_tone, compile_transform, fit_size, make_preview_proxy
+    )
+    sample = make_preview_proxy(image, (STATS_SAMPLE_SIZE, STATS_SAMPLE_SIZE))
+    kind, _, detail = name.partition(".")
+    if kind == "filter":
+        params = getattr(MorandiFilters, detail.upper())
+        return lambda: apply_morandi_tone(image, *params)
+    if kind == "adjust":
+        settings = {"brightness": 1.2, "contrast": 1.2, "saturation": 1.3}
+        transform = compile_transform(sample=sample, **{detail: settings[detail]})
+        return lambda: transform.apply(image)
+    if kind == "pipeline":
+        pipeline = AdjustmentPipeline()
+        pipeline.filter = MorandiFilters.SAGE
+        pipeline.brightness, pipeline.contrast, pipeline.saturation = 1.1, 0.9, 1.2
+        return lambda: pipeline.render(image, reference=sample)
+    if kind == "display":
+        size = fit_size(image.size, DISPLAY_BOUNDS)
+        final = detail == "final"
+        # 每次新建 MipChain, 计入逐级缩小的开销
+        return lambda: MipChain(image).resize(size, final)
+    raise ValueError(f"未知用例: {name}")
+
+
+def gif_case(name, path):
+    """GIF 用例: decode 为无磁盘缓存的逐帧解码, cached 为读取已写好的帧缓存"""
+    from animated_gif import AnimatedGIF
+    if name == "gif.decode":
+        def run():
+            gif = AnimatedGIF(None, path, size=GIF_SIZE, use_cache=False)
+            for index in range(gif.frame_count):
+                gif._decode_frame(index)
+        return run
+    # 先完整解码一轮写入缓存 (不计时), 之后每次计时从缓存映射全部帧
+    warm = AnimatedGIF(None, path, size=GIF_SIZE)
+    if warm.sheet is None:
+        for index in range(warm.frame_count):
+            warm._record(index, *warm._decode_frame(index))
+    
+    def run():
+        gif = AnimatedGIF(None, path, size=GIF_SIZE)
+        for index in range(gif.frame_count):
+            gif.sheet.frame(index)
+    return run
+
+
+def startup_case(name, module):
+    """冷启动: import 只计导入; window 计导入、创建窗口到首次空闲"""
+    start = time.perf_counter()
+    imported = __import__(module)
+    if name == "startup.window":
+        app = getattr(imported, dict(STARTUP_APPS)[module])()
+        app.update()
+        elapsed = time.perf_counter() - start
+        app.destroy()
+        return elapsed
+    return time.perf_counter() - start
+
+
+def run_case(spec):
+    """在当前 (全新的) 进程中执行一个用例, 返回结果字典"""
+    name, source, repeat = spec["name"], spec["source"], spec["repeat"]
+    rss_before = peak_rss_mb()
+    timings = []
+    if name.startswith("startup."):
+        # 冷启动只有第一次有意义, 重复由父进程用新进程完成
+        timings.append(startup_case(name, source))
+    else:
+        func = gif_case(name, os.path.join(ROOT, source)) if name.startswith("gif.") else \
+            image_case(name, load_source(source))
+        rss_before = peak_rss_mb()
+        func()  # 预热: 编译、惰性初始化不计入
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "source": source,
+        "timings_ms": [t * 1000 for t in timings],
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ========== 父进程: 生成用例、汇总、对比 ==========
+def has_display():
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def image_sources(sizes, quick):
+    sources = []
+    for pattern in SAMPLE_PATTERNS:
+        matches = sorted(os.path.basename(path) for path in glob.glob(os.path.join(ROOT, pattern)))
+        sources += matches[:1] if quick else matches
+    return sources + [f"synthetic:{size:g}" for size in sizes]
+
+
+def gif_sources():
+    """仓库中的动画 (GIF 与动态 WebP); 按文件内容识别格式, 没有扩展名的 GIF 也包含在内"""
+    from PIL import Image
+    result = []
+    for directory in GIF_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            paths = sorted(entry.path for entry in entries if entry.is_file())
+        for path in paths:
+            try:
+                with Image.open(path) as image:
+                    # 动态 WebP 与 GIF 走同一条路径; 单帧图片跳过
+                    if image.format in ("GIF", "WEBP") and getattr(image, "n_frames", 1) > 1:
+                        result.append(os.path.relpath(path, ROOT))
+            except OSError:
+                continue
+    return result
+
+
+def build_cases(args):
+    image_names = [f"filter.{name}" for name in ("rose", "sage", "lavender", "dusty_blue")] + [
+        "adjust.brightness", "adjust.contrast", "adjust.saturation",
+        "pipeline", "display.interactive", "display.final",
+    ]
+    cases = []
+    for source in image_sources(args.sizes, args.quick):
+        # 大图减少重复次数, 控制总时长
+        repeat = args.repeat if not source.startswith("synthetic:") or float(source[10:]) < 20 else 1
+        cases += [{"name": name, "source": source, "repeat": repeat} for name in image_names]
+    for path in gif_sources():
+        cases += [{"name": name, "source": path, "repeat": args.repeat} for name in ("gif.decode", "gif.cached")]
+    for module, _ in STARTUP_APPS:
+        cases.append({"name": "startup.import", "source": module, "repeat": args.repeat})
+        cases.append({"name": "startup.window", "source": module, "repeat": args.repeat})
+    if args.only:
+        cases = [case for case in cases if case["name"].startswith(args.only)]
+    return cases
+
+
+def execute(case, environment):
+    """在新解释器中执行用例; startup.* 每次重复都是一个新进程"""
+    runs = case["repeat"] if case["name"].startswith("startup.") else 1
+    results = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+            cwd=ROOT, env=environment, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = (completed.stderr.strip().splitlines() or ["未知错误"])[-1]
+            return dict(case, error=error)
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    result = results[0]
+    result["timings_ms"] = [t for r in results for t in r["timings_ms"]]
+    result["peak_rss_mb"] = max((r["peak_rss_mb"] or 0) for r in results) or None
+    timings = result["timings_ms"]
+    result["min_ms"] = min(timings)
+    result["median_ms"] = statistics.median(timings)
+    return result
+
+
+def metadata():
+    from PIL import __version__ as pillow_version
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pillow": pillow_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def case_key(result):
+    return f"{result['name']}|{result['source']}"
+
+
+def compare(results, baseline_path, tolerance, min_delta):
+    """与基线对比中位数, 返回变慢超过容差的用例数 (差值小于 min_delta 毫秒的视为噪声)"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"] if "median_ms" in r}
+    regressions = 0
+    print(f"\n与基线对比 ({baseline_path}, 容差 {tolerance:.0%}):")
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None or "median_ms" not in result:
+            continue
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else 1.0
+        flag = ""
+        if abs(result["median_ms"] - old["median_ms"]) < min_delta:
+            pass
+        elif ratio > 1 + tolerance:
+            flag = "  ← 变慢"
+            regressions += 1
+        elif ratio < 1 - tolerance:
+            flag = "  ← 变快"
+        print(f"  {case_key(result):<60} {old['median_ms']:9.2f} → {result['median_ms']:9.2f} ms"
+              f"  ({ratio:4.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Morandi 图片管线与启动基准测试")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help="结果 JSON 路径")
+    parser.add_argument("--baseline", help="基线 JSON 路径, 对比后有变慢的用例时返回 1")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="判定变慢的相对容差 (默认 0.10)")
+    parser.add_argument("--min-delta", type=float, default=1.0, help="小于该差值 (毫秒) 的变化视为噪声 (默认 1.0)")
+    parser.add_argument("--sizes", default=",".join(f"{s:g}" for s in DEFAULT_SIZES),
+                        help="合成图片尺寸 (百万像素, 逗号分隔)")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数 (默认 3)")
+    parser.add_argument("--only", help="只运行名称以此开头的用例")
+    parser.add_argument("--quick", action="store_true", help="每种格式只取一张样图")
+    args = parser.parse_args()
+    
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+    
+    args.sizes = [float(size) for size in args.sizes.split(",") if size]
+    cases = build_cases(args)
+    display = has_display()
+    # GIF 帧缓存写入临时目录, 不影响用户的缓存
+    cache_home = tempfile.mkdtemp(prefix="morandi-bench-")
+    environment = dict(os.environ, XDG_CACHE_HOME=cache_home, LOCALAPPDATA=cache_home)
+    
+    results = []
+    try:
+        for case in cases:
+            if case["name"] == "startup.window" and not display:
+                results.append(dict(case, skipped="没有显示器 (可用 xvfb-run 运行)"))
+                print(f"{case_key(case):<60} 跳过: 没有显示器")
+                continue
+            result = execute(case, environment)
+            results.append(result)
+            if "error" in result:
+                print(f"{case_key(result):<60} 失败: {result['error']}")
+                continue
+            rss = f"{result['peak_rss_mb']:8.1f} MB" if result["peak_rss_mb"] else "       -"
+            print(f"{case_key(result):<60} {result['median_ms']:9.2f} ms  (min {result['min_ms']:.2f})  峰值 {rss}")
+    finally:
+        shutil.rmtree(cache_home, ignore_errors=True)
+    
+    report = {"meta": metadata(), "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入 {args.out}")
+    if args.baseline:
+        return 1 if compare(results, args.baseline, args.tolerance, args.min_delta) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,62 +4,19 @@ Liquid Glass Style Borderless Rounded Window Application
 """
 
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageSequence
+from PIL import ImageTk, ImageDraw, ImageFilter
 import urllib.request
 import io
 import os
 import sys
 
+from animated_gif import AnimatedGIF
+
 # 设置外观模式和默认颜色主题
 ctk.set_appearance_mode("light")
 ctk.set_default_color_theme("blue")
 
 
-class AnimatedGIF:
-    """处理GIF动画的类 - 支持CTkImage以获得更好的HighDPI支持"""
-    def __init__(self, label, gif_path, size=(80, 80)):
-        self.label = label
-        self.size = size
-        self.frames = []
-        self.pil_frames = []  # 保存PIL图像用于CTkImage
-        self.durations = []
-        self.current_frame = 0
-        self.is_playing = True
-        
-        # 加载GIF帧
-        try:
-            gif = Image.open(gif_path)
-            for frame in ImageSequence.Iterator(gif):
-                # 转换并调整大小
-                pil_frame = frame.copy().convert("RGBA")
-                pil_frame = pil_frame.resize(size, Image.Resampling.LANCZOS)
-                self.pil_frames.append(pil_frame)
-                # 创建CTkImage以支持HighDPI
-                ctk_image = ctk.CTkImage(light_image=pil_frame, dark_image=pil_frame, size=size)
-                self.frames.append(ctk_image)
-                # 获取帧持续时间
-                duration = gif.info.get('duration', 100)
-                self.durations.append(duration if duration > 0 else 100)
-        except Exception as e:
-            print(f"加载GIF失败: {e}")
-            self.frames = []
-    
-    def animate(self):
-        if self.frames and self.is_playing:
-            self.label.configure(image=self.frames[self.current_frame])
-            self.current_frame = (self.current_frame + 1) % len(self.frames)
-            duration = self.durations[self.current_frame] if self.durations else 100
-            self.label.after(duration, self.animate)
-    
-    def start(self):
-        if self.frames:
-            self.is_playing = True
-            self.animate()
-    
-    def stop(self):
-        self.is_playing = False
-
-
 class LiquidGlassCard(ctk.CTkFrame):
     """液态玻璃风格卡片组件"""
     def __init__(self, master, title="", description="", icon_url=None, **kwargs):
@@ -572,7 +529,7 @@ class LiquidGlassApp(ctk.CTk):
     def close_window(self):
         """关闭窗口"""
         if hasattr(self, 'animated_gif'):
-            self.animated_gif.stop()
+            self.animated_gif.close()
         self.destroy()
 
 
@@ -0,0 +1,6 @@
+"""
+Morandi Image Tools
+莫兰迪色系图片处理 - 命令行工具
+
+用法: python -m morandi batch --filter sage --brightness 1.1 in/ out/
+"""
@@ -0,0 +1,23 @@
+"""
+命令行入口: python -m morandi <命令> ...
+"""
+
+import argparse
+import sys
+
+from morandi import batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m morandi", description="莫兰迪色系图片处理")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch.add_arguments(commands.add_parser("batch", help="批量处理目录中的图片"))
+    
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        return batch.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
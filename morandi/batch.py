@@ -0,0 +1,128 @@
+"""
+批量处理 - 与 MorandiImageApp 共用 morandi.core 中的颜色变换, 在多进程中处理整个目录
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from PIL import Image
+
+from morandi.core import BLEND_MODES, IMAGE_EXTENSIONS, AdjustmentPipeline, MorandiFilters
+from morandi.export import EncoderOptions, export_image, format_size
+
+FILTER_NAMES = ("none", "rose", "sage", "lavender", "dusty-blue")
+
+
+def filter_params(name):
+    """滤镜名称 -> MorandiFilters 中的参数"""
+    if name == "none":
+        return None
+    return getattr(MorandiFilters, name.upper().replace("-", "_"))
+
+
+def iter_images(input_dir, recursive=False):
+    """逐个产出目录中的图片路径, 不预先收集整个列表"""
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    yield from iter_images(entry.path, recursive)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+
+
+def process_image(source_path, target_path, signature, options, strength=1.0, blend="normal"):
+    """处理单张图片 (在工作进程中执行)
+    
+    滤镜强度或混合模式不是默认值时, 滤镜阶段改用 NumPy 后端 (只在这时才导入);
+    超过 TILED_THRESHOLD 像素的图片分块处理; options 为 EncoderOptions。
+    """
+    pipeline = AdjustmentPipeline()
+    with Image.open(source_path) as image:
+        image = image.convert("RGB")
+    if signature[0] and (strength != 1.0 or blend != "normal"):
+        from morandi import numpy_backend
+        image = numpy_backend.apply_morandi_tone(image, *signature[0], strength=strength, blend=blend)
+        signature = (None,) + signature[1:]
+    transform = pipeline.transform_for(image, signature=signature)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    # 源图在此之后不再使用, 可以原地写回; 进程池已经并行, 分块不再开线程
+    return export_image(image, transform, target_path, options, in_place=True, workers=1)
+
+
+def add_arguments(parser):
+    parser.add_argument("input", help="输入目录")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("--filter", choices=FILTER_NAMES, default="none", help="莫兰迪滤镜")
+    parser.add_argument("--strength", type=float, default=1.0, help="滤镜强度 0~1 (默认 1.0, 需要 --filter 和 numpy)")
+    parser.add_argument("--blend", choices=BLEND_MODES, default="normal",
+                        help="滤镜混合模式 (默认 normal, 需要 --filter 和 numpy)")
+    parser.add_argument("--brightness", type=float, default=1.0, help="亮度 (默认 1.0)")
+    parser.add_argument("--contrast", type=float, default=1.0, help="对比度 (默认 1.0)")
+    parser.add_argument("--saturation", type=float, default=1.0, help="饱和度 (默认 1.0)")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WebP 质量 (默认 90)")
+    parser.add_argument("--optimize", action="store_true", help="JPEG 优化霍夫曼表")
+    parser.add_argument("--progressive", action="store_true", help="JPEG 渐进式编码")
+    parser.add_argument("--compress-level", type=int, default=6, help="PNG 压缩级别 0~9 / WebP 压缩力度 (默认 6)")
+    parser.add_argument("--recursive", action="store_true", help="包含子目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数 (默认每个核心一个)")
+
+
+def run(args):
+    signature = (filter_params(args.filter), args.brightness, args.contrast, args.saturation)
+    options = EncoderOptions(args.quality, args.optimize, args.progressive, args.compress_level)
+    if not 0.0 <= args.strength <= 1.0:
+        print("--strength 应在 0~1 之间", file=sys.stderr)
+        return 2
+    if args.strength != 1.0 or args.blend != "normal":
+        if args.filter == "none":
+            print("--strength / --blend 需要同时指定 --filter", file=sys.stderr)
+            return 2
+        from morandi import numpy_backend
+        if not numpy_backend.HAS_NUMPY:
+            print("--strength / --blend 需要安装 numpy", file=sys.stderr)
+            return 2
+    workers = max(1, args.workers)
+    max_pending = workers * 4  # 限制排队任务数, 目录列表边遍历边提交
+    
+    done = failed = output_bytes = 0
+    next_report = 100   # 每处理 100 张报告一次进度 (一批完成数可能跨过整百)
+    start = time.perf_counter()
+    pending = {}
+    
+    def collect(futures):
+        nonlocal done, failed, output_bytes, next_report
+        for future in futures:
+            source_path = pending.pop(future)
+            try:
+                output_bytes += future.result().size
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"处理失败 {source_path}: {e}", file=sys.stderr)
+        if done >= next_report:
+            elapsed = time.perf_counter() - start
+            print(f"已处理 {done} 张, {done / elapsed:.1f} 张/秒")
+            next_report = (done // 100 + 1) * 100
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for source_path in iter_images(args.input, args.recursive):
+            relative = os.path.relpath(source_path, args.input)
+            target_path = os.path.join(args.output, relative)
+            future = executor.submit(
+                process_image, source_path, target_path, signature, options, args.strength, args.blend
+            )
+            pending[future] = source_path
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+    
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"完成: {done} 张, 失败 {failed} 张, 用时 {elapsed:.2f} 秒, {rate:.1f} 张/秒 ({workers} 个进程), 输出 {format_size(output_bytes)}")
+    return 1 if failed else 0
@@ -0,0 +1,292 @@
+"""
+Morandi Image Processing Core
+莫兰迪色系图片处理核心 - 不依赖任何 GUI 库, 供 MorandiImageApp、批处理和工作进程共用
+"""
+
+import threading
+
+from PIL import Image, ImageOps, ImageStat
+
+from morandi.profiling import profiler
+
+# 可以打开的图片扩展名
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp")
+
+
+# ========== 莫兰迪滤镜参数 ==========
+class MorandiFilters:
+    """莫兰迪滤镜参数 (r_shift, g_shift, b_shift, saturation)"""
+    ROSE = (15, -5, -10, 0.65)         # 玫瑰灰调
+    SAGE = (-10, 10, -5, 0.6)          # 鼠尾草绿
+    LAVENDER = (5, -5, 15, 0.6)        # 薰衣草紫
+    DUSTY_BLUE = (-10, 0, 15, 0.55)    # 雾霾蓝
+
+
+# 滤镜的混合模式 (由 NumPy 后端实现; 定义在这里, 命令行解析不必导入 NumPy)
+BLEND_MODES = ("normal", "multiply", "screen", "overlay", "soft-light")
+
+
+# ========== 颜色变换 ==========
+# ITU-R 601-2 亮度系数, 与 PIL convert("L") 一致
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+# 估计对比度中心时使用的采样图最大边长
+STATS_SAMPLE_SIZE = 256
+
+
+def saturation_matrix(factor):
+    """生成饱和度调整的 3×3 颜色矩阵 (PIL convert 所需的 12 元组)"""
+    matrix = []
+    for channel in range(3):
+        row = [(1 - factor) * weight for weight in LUMA_WEIGHTS]
+        row[channel] += factor
+        matrix.extend(row + [0])
+    return tuple(matrix)
+
+
+def _clip(value):
+    """截断到 0~255"""
+    if value < 0:
+        return 0
+    if value > 255:
+        return 255
+    return int(value)
+
+
+def build_channel_lut(shift=0, brightness=1.0, contrast=1.0, pivot=128):
+    """将色调偏移、亮度、对比度折叠为 256 项查找表 (每步都截断, 与逐步处理一致)"""
+    lut = []
+    for x in range(256):
+        value = _clip(x + shift)
+        value = _clip(value * brightness)
+        value = _clip(pivot + contrast * (value - pivot))
+        lut.append(value)
+    return lut
+
+
+class ColorTransform:
+    """编译后的颜色变换: 饱和度矩阵 → 合并查找表 → 饱和度矩阵
+    
+    每一步都是一次 C 层的整图运算, 没有 split/merge 和 Python lambda,
+    为空操作的步骤直接跳过。
+    """
+    def __init__(self, pre_matrix=None, lut=None, post_matrix=None):
+        self.pre_matrix = pre_matrix
+        self.lut = lut
+        self.post_matrix = post_matrix
+    
+    def is_identity(self):
+        return self.pre_matrix is None and self.lut is None and self.post_matrix is None
+    
+    def apply(self, image):
+        """对 RGB 图片执行变换, 返回新图片"""
+        if self.is_identity():
+            return image.copy()
+        if self.pre_matrix:
+            with profiler.span("pipeline.pre_matrix"):
+                image = image.convert("RGB", self.pre_matrix)
+        if self.lut:
+            with profiler.span("pipeline.lut"):
+                image = image.point(self.lut)
+        if self.post_matrix:
+            with profiler.span("pipeline.post_matrix"):
+                image = image.convert("RGB", self.post_matrix)
+        return image
+
+
+def compile_transform(filter=None, brightness=1.0, contrast=1.0, saturation=1.0, sample=None):
+    """把 滤镜 → 亮度 → 对比度 → 饱和度 编译为一个 ColorTransform
+    
+    对比度以输入图的平均亮度为中心 (与 ImageEnhance.Contrast 相同),
+    该值在 sample 上估计; 未提供 sample 时以 128 为中心。
+    """
+    pre_matrix = saturation_matrix(filter[3]) if filter else None
+    shifts = filter[:3] if filter else (0, 0, 0)
+    
+    pivot = 128
+    if contrast != 1.0 and sample is not None:
+        partial = ColorTransform(pre_matrix, _join_luts(shifts, brightness))
+        stat_image = partial.apply(sample).convert("L")
+        pivot = int(ImageStat.Stat(stat_image).mean[0] + 0.5)
+    
+    lut = None
+    if any(shifts) or brightness != 1.0 or contrast != 1.0:
+        lut = _join_luts(shifts, brightness, contrast, pivot)
+    post_matrix = saturation_matrix(saturation) if saturation != 1.0 else None
+    return ColorTransform(pre_matrix, lut, post_matrix)
+
+
+def _join_luts(shifts, brightness=1.0, contrast=1.0, pivot=128):
+    """生成 R、G、B 三通道拼接的查找表"""
+    lut = []
+    for shift in shifts:
+        lut.extend(build_channel_lut(shift, brightness, contrast, pivot))
+    return lut
+
+
+def apply_morandi_tone(image, r_shift, g_shift, b_shift, saturation=0.7):
+    """应用莫兰迪色调"""
+    return compile_transform(filter=(r_shift, g_shift, b_shift, saturation)).apply(image)
+
+
+class AdjustmentPipeline:
+    """非破坏性调整图: 滤镜 → 亮度 → 对比度 → 饱和度
+    
+    每次都从原图重新计算, 参数之间不会叠加; 整条链编译为一个
+    ColorTransform, 参数不变时复用编译结果。预览、视口和保存在多个工作线程中
+    共用一个实例, 采样图和编译结果的缓存由锁保护。
+    """
+    def __init__(self):
+        self.filter = None        # MorandiFilters 中的参数, None 表示无滤镜
+        self.brightness = 1.0
+        self.contrast = 1.0
+        self.saturation = 1.0
+        self._compiled = None     # (参数, 采样图, ColorTransform)
+        self._sample = None       # (参考图, 采样图)
+        self._lock = threading.Lock()
+    
+    def reset(self):
+        """恢复全部参数为默认值"""
+        self.filter = None
+        self.brightness = 1.0
+        self.contrast = 1.0
+        self.saturation = 1.0
+    
+    def signature(self):
+        """当前参数的不可变表示"""
+        return (self.filter, self.brightness, self.contrast, self.saturation)
+    
+    def restore(self, signature):
+        """恢复 signature() 记录的参数 (撤销 / 重做)"""
+        self.filter, self.brightness, self.contrast, self.saturation = signature
+    
+    def sample_for(self, reference):
+        """获取参考图的小尺寸采样图, 按参考图缓存"""
+        with self._lock:
+            cached = self._sample
+            if cached and cached[0] is reference:
+                return cached[1]
+            sample = reference
+            if max(reference.size) > STATS_SAMPLE_SIZE:
+                sample = make_preview_proxy(reference, (STATS_SAMPLE_SIZE, STATS_SAMPLE_SIZE))
+            self._sample = (reference, sample)
+            return sample
+    
+    def compile(self, sample, signature=None):
+        """编译参数 (默认为当前参数), sample 用于估计对比度中心"""
+        signature = signature or self.signature()
+        with self._lock:
+            cached = self._compiled
+            if cached and cached[0] == signature and cached[1] is sample:
+                return cached[2]
+            with profiler.span("pipeline.compile"):
+                transform = compile_transform(*signature, sample=sample)
+            self._compiled = (signature, sample, transform)
+            return transform
+    
+    def render(self, source, reference=None, signature=None):
+        """从源图计算调整结果, 返回新图片 (不修改源图)
+        
+        reference 是估计统计量所用的参考图, 默认为源图本身;
+        全分辨率渲染时传入预览代理图, 保证结果与预览一致。
+        在后台线程渲染时应传入提交任务时的 signature 快照。
+        """
+        return self.transform_for(source, reference, signature).apply(source)
+    
+    def transform_for(self, source, reference=None, signature=None):
+        """返回作用于 source 的已编译变换, 参数含义同 render (供分块处理使用)"""
+        sample = self.sample_for(reference if reference is not None else source)
+        return self.compile(sample, signature)
+
+
+# ========== 预览与解码 ==========
+def make_preview_proxy(image, size):
+    """生成适应显示区域的预览代理图"""
+    proxy = image.copy()
+    proxy.thumbnail(size, Image.Resampling.LANCZOS)
+    return proxy
+
+
+def make_thumbnail(image, size):
+    """生成居中裁剪的正方形缩略图, 供滤镜预览条使用"""
+    return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def render_filter_thumbnail(thumbnail, params):
+    """只应用滤镜阶段 (不含亮度等调整) 渲染缩略图"""
+    return compile_transform(params, sample=thumbnail).apply(thumbnail)
+
+
+def fit_size(image_size, bounds):
+    """保持宽高比计算适应 bounds 的尺寸"""
+    display_width, display_height = bounds
+    img_ratio = image_size[0] / image_size[1]
+    display_ratio = display_width / display_height
+    
+    if img_ratio > display_ratio:
+        new_width = display_width
+        new_height = int(display_width / img_ratio)
+    else:
+        new_height = display_height
+        new_width = int(display_height * img_ratio)
+    return max(1, new_width), max(1, new_height)
+
+
+class MipChain:
+    """按 2 的幂逐级缩小的图片链 (½, ¼, ⅛ …), 各级在首次使用时用 Image.reduce 生成"""
+    def __init__(self, base):
+        self.levels = [base]
+    
+    @property
+    def base(self):
+        return self.levels[0]
+    
+    def level_for(self, size):
+        """返回宽高都不小于 size 的最小一级"""
+        index = 0
+        while True:
+            level = self.levels[index]
+            if level.width // 2 < size[0] or level.height // 2 < size[1]:
+                return level
+            if index + 1 == len(self.levels):
+                with profiler.span("resize.reduce"):
+                    self.levels.append(level.reduce(2))
+            index += 1
+    
+    def resize(self, size, final=False):
+        """缩放到 size: 交互时从最接近的一级做 BILINEAR, final 时从原图做 LANCZOS"""
+        if final:
+            with profiler.span("resize.lanczos"):
+                return self.base.resize(size, Image.Resampling.LANCZOS)
+        level = self.level_for(size)
+        if level.size == tuple(size):
+            return level
+        with profiler.span("resize.bilinear"):
+            return level.resize(size, Image.Resampling.BILINEAR)
+
+
+def load_image(path, preview_size):
+    """快速打开图片并建立金字塔 (在后台线程执行)
+    
+    支持 draft() 的格式 (JPEG) 直接在 DCT 域按 1/2、1/4、1/8 缩小解码,
+    只得到不小于预览尺寸的图片; 其他格式按原尺寸解码。
+    返回 (原图, 金字塔, 原始尺寸), 原图为 None 表示全分辨率尚未解码,
+    需要时再调用 load_full_image。
+    """
+    with profiler.span("decode.preview"):
+        image = Image.open(path)
+        full_size = image.size
+        image.draft("RGB", preview_size)
+        image = image.convert("RGB")
+    original = image if image.size == full_size else None
+    
+    pyramid = MipChain(image)
+    pyramid.level_for(preview_size)
+    pyramid.level_for((STATS_SAMPLE_SIZE, STATS_SAMPLE_SIZE))
+    return original, pyramid, full_size
+
+
+def load_full_image(path):
+    """解码全分辨率图片 (在后台线程执行)"""
+    with profiler.span("decode.full"):
+        return Image.open(path).convert("RGB")
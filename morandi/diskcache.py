@@ -0,0 +1,62 @@
+"""
+Disk Cache
+按文件存放的磁盘缓存 - 缩略图缓存和 GIF 帧缓存共用的淘汰逻辑
+
+每个条目一个文件 (可以按哈希前缀分到一层子目录中), 以修改时间为最近使用时间;
+总大小超过 max_bytes 时删除最旧的文件。
+"""
+
+import os
+
+
+class DiskCache:
+    """缓存目录中以 SUFFIX 结尾的文件, 子类负责键和文件内容"""
+    SUFFIX = ""
+    
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+    
+    def entries(self):
+        """返回 [(修改时间, 大小, 路径)], 包括一层子目录中的文件"""
+        result = []
+        directories = [self.directory]
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as files:
+                    for entry in files:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if directory == self.directory:
+                                    directories.append(entry.path)
+                            elif entry.name.endswith(self.SUFFIX):
+                                stat = entry.stat()
+                                result.append((stat.st_mtime, stat.st_size, entry.path))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return result
+    
+    def evict(self):
+        """删除最旧的文件, 直到总大小不超过 max_bytes"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self.remove(path):
+                total -= size
+    
+    def clear(self):
+        """清空缓存, 返回删除的文件数"""
+        return sum(1 for _, _, path in self.entries() if self.remove(path))
+    
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,128 @@
+"""
+Export
+按格式编码并原子写入 - 供 MorandiImageApp 的后台保存和批处理共用
+
+编码结果先写入同目录的临时文件, 完成后再替换目标文件,
+中途失败或取消不会留下半个文件, 也不会破坏已有的同名文件。
+"""
+
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from morandi.profiling import profiler
+from morandi.tiled import TILED_THRESHOLD, render_tiled, save_tiled
+
+# 扩展名 -> PIL 格式名
+FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".webp": "WEBP",
+    ".bmp": "BMP",
+    ".gif": "GIF",   # 保存时由 PIL 量化为 256 色, 只保存单帧
+}
+
+
+def format_for(path):
+    """由扩展名确定输出格式"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"不支持的输出格式: {extension or path}")
+    return FORMATS[extension]
+
+
+class EncoderOptions:
+    """编码器选项; 每种格式只使用与之相关的部分"""
+    def __init__(self, quality=90, optimize=False, progressive=False, compress_level=6):
+        self.quality = quality               # JPEG / WebP 质量 (1~100)
+        self.optimize = optimize             # JPEG 优化霍夫曼表
+        self.progressive = progressive       # JPEG 渐进式
+        self.compress_level = compress_level # PNG zlib 级别 (0~9), WebP 压缩力度
+    
+    def params_for(self, format):
+        """生成 Image.save 的参数"""
+        if format == "JPEG":
+            return {"quality": self.quality, "optimize": self.optimize, "progressive": self.progressive}
+        if format == "PNG":
+            return {"compress_level": self.compress_level}
+        if format == "WEBP":
+            # WebP 没有 compress_level, 对应的是 0~6 的 method (越大越慢、越小)
+            return {"quality": self.quality, "method": min(6, self.compress_level)}
+        return {}
+
+
+class ExportResult:
+    """一次导出的统计: 渲染和编码耗时 (秒) 与输出大小 (字节)
+    
+    PNG 分块流式编码时渲染与编码交替进行, render_seconds 为 None, 全部计入编码。
+    """
+    def __init__(self, path, format, render_seconds, encode_seconds, size):
+        self.path = path
+        self.format = format
+        self.render_seconds = render_seconds
+        self.encode_seconds = encode_seconds
+        self.size = size
+
+
+@contextmanager
+def atomic_write(path):
+    """打开同目录下的临时文件供写入, 成功后替换 path, 失败时删除临时文件"""
+    directory, name = os.path.split(os.path.abspath(path))
+    temp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    # 用 os.open 而非 mkstemp, 新文件的权限才遵循 umask
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def export_image(source, transform, path, options=None, tiled=None, in_place=False, workers=None):
+    """对 source 应用已编译的变换并保存到 path, 返回 ExportResult
+    
+    tiled 默认在超过 TILED_THRESHOLD 像素时启用; in_place=True 允许分块结果写回源图。
+    """
+    format = format_for(path)
+    params = (options or EncoderOptions()).params_for(format)
+    if tiled is None:
+        tiled = source.width * source.height > TILED_THRESHOLD
+    
+    start = time.perf_counter()
+    if tiled and format == "PNG":
+        with atomic_write(path) as f:
+            save_tiled(source, transform, f, format, workers=workers, **params)
+        render_seconds = None
+        encode_start = start
+    else:
+        if tiled:
+            rendered = render_tiled(source, transform, in_place=in_place, workers=workers)
+        else:
+            rendered = transform.apply(source)
+        encode_start = time.perf_counter()
+        render_seconds = encode_start - start
+        with atomic_write(path) as f:
+            rendered.save(f, format, **params)
+    end = time.perf_counter()
+    encode_seconds = end - encode_start
+    if profiler.enabled:
+        if render_seconds is not None:
+            profiler.record("export.render", start, encode_start)
+        profiler.record("export.encode", encode_start, end)
+    return ExportResult(path, format, render_seconds, encode_seconds, os.path.getsize(path))
+
+
+def format_size(size):
+    """字节数 -> 便于阅读的文本"""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
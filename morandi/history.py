@@ -0,0 +1,164 @@
+"""
+History
+撤销 / 重做历史
+
+每一步只记录调整图的参数 (几十字节), 不保存全分辨率副本; 另外按
+内存预算缓存若干步的预览层级渲染结果, 撤销和重做命中时无需重新计算。
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+HISTORY_LIMIT = 200                  # 最多保留的步数
+SNAPSHOT_BUDGET = 64 * 1024 * 1024   # 预览快照的内存预算 (字节)
+
+
+def image_bytes(image):
+    """估计图片占用的内存"""
+    return image.width * image.height * len(image.getbands())
+
+
+class ImageLRU:
+    """图片的 LRU 缓存, 总字节数不超过预算; 渲染和导出在后台线程进行, 所有操作都加锁
+    
+    put 时给出 owner 的条目以 owner 的身份区分 (键中通常含 id(owner)), 只保存其弱引用,
+    owner 被回收、id 被复用后也不会误命中。超过预算的单张图片不缓存。
+    子类可以重写 size_of, 缓存其它对象或按条目数计算预算。
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.total = 0
+        self._items = OrderedDict()   # 键 -> (owner 弱引用或 None, 图片)
+        self._lock = threading.Lock()
+    
+    def size_of(self, image):
+        return image_bytes(image)
+    
+    def get(self, key, owner=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or (item[0] is not None and item[0]() is not owner):
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+    
+    def put(self, key, image, owner=None):
+        nbytes = self.size_of(image)
+        with self._lock:
+            # 先移除旧条目: 新图片超出预算不缓存时, 旧的结果也已过期
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total -= self.size_of(old[1])
+            if nbytes > self.budget:
+                return
+            self._items[key] = (weakref.ref(owner) if owner is not None else None, image)
+            self.total += nbytes
+            while self.total > self.budget:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.total -= self.size_of(evicted)
+    
+    def discard(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self.total -= self.size_of(item[1])
+    
+    def discard_where(self, predicate):
+        """丢弃键满足 predicate 的所有条目"""
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                self.total -= self.size_of(self._items.pop(key)[1])
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total = 0
+    
+    def __contains__(self, key):
+        return key in self._items
+    
+    def __len__(self):
+        return len(self._items)
+
+
+class SnapshotCache(ImageLRU):
+    """预览快照的缓存, 按 (层级, 参数) 索引; 以层级对象的身份区分图片, 换图后旧快照不会被误用"""
+    def __init__(self, budget=SNAPSHOT_BUDGET):
+        super().__init__(budget)
+    
+    def get(self, level, signature):
+        return super().get((id(level), signature), level)
+    
+    def put(self, level, signature, image):
+        super().put((id(level), signature), image, level)
+    
+    def discard_signatures(self, levels, signatures):
+        """丢弃 levels 中各层级上、参数属于 signatures 的快照 (共用缓存的其它图片不受影响)"""
+        level_ids = {id(level) for level in levels}
+        self.discard_where(lambda key: key[0] in level_ids and key[1] in signatures)
+
+
+class EditHistory:
+    """参数历史: 线性的撤销栈, 在中间位置记录新步骤时丢弃重做分支
+    
+    多个历史可以共用一个 SnapshotCache (快照按层级身份区分), 使预算对整个会话生效。
+    """
+    def __init__(self, limit=HISTORY_LIMIT, budget=SNAPSHOT_BUDGET, snapshots=None):
+        self.limit = limit
+        self.entries = []     # AdjustmentPipeline.signature() 的序列
+        self.index = -1       # 当前步骤在 entries 中的位置
+        self.snapshots = snapshots if snapshots is not None else SnapshotCache(budget)
+        self.levels = weakref.WeakValueDictionary()   # id -> 本历史存过快照的层级 (图片不可哈希)
+    
+    def current(self):
+        return self.entries[self.index] if self.entries else None
+    
+    def record(self, signature):
+        """记录一步; 与当前步骤相同时忽略 (撤销后的重绘也走这里)"""
+        if signature == self.current():
+            return False
+        dropped = set(self.entries[self.index + 1:])
+        del self.entries[self.index + 1:]
+        self.entries.append(signature)
+        if len(self.entries) > self.limit:
+            dropped.update(self.entries[:-self.limit])
+            del self.entries[:-self.limit]
+        self.index = len(self.entries) - 1
+        self.snapshots.discard_signatures(self.levels.values(), dropped - set(self.entries))
+        return True
+    
+    def store_snapshot(self, level, signature, image):
+        """缓存某一步在 level 上的预览渲染结果"""
+        self.levels[id(level)] = level
+        self.snapshots.put(level, signature, image)
+    
+    def discard_snapshots(self):
+        """丢弃本历史的所有快照 (关闭图片时调用)"""
+        self.snapshots.discard_signatures(self.levels.values(), set(self.entries))
+    
+    def can_undo(self):
+        return self.index > 0
+    
+    def can_redo(self):
+        return self.index < len(self.entries) - 1
+    
+    def undo(self):
+        """后退一步, 返回要恢复的参数; 无法撤销时返回 None"""
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        return self.entries[self.index]
+    
+    def redo(self):
+        """前进一步, 返回要恢复的参数; 无法重做时返回 None"""
+        if not self.can_redo():
+            return None
+        self.index += 1
+        return self.entries[self.index]
+    
+    def reset(self, signature):
+        """清空历史, 以 signature 作为第一步; 本历史各步的快照一并丢弃"""
+        self.discard_snapshots()
+        self.entries = [signature]
+        self.index = 0
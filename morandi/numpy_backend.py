@@ -0,0 +1,92 @@
+"""
+NumPy Backend
+莫兰迪调色的 NumPy 向量化实现 (可选依赖)
+
+降饱和与色调偏移在一次 int16 定点运算中完成, 两端都显式截断;
+另外支持滤镜强度和混合模式。未安装 NumPy 时 HAS_NUMPY 为 False。
+"""
+
+from PIL import Image
+
+from morandi.core import BLEND_MODES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAS_NUMPY = np is not None
+
+# 7 位定点的亮度系数 (和为 128), 保证 255 × 128 不超出 int16
+LUMA_WEIGHTS_Q7 = (38, 75, 15)
+
+
+def _q7(value):
+    """浮点系数 -> 7 位定点整数"""
+    return int(round(value * 128))
+
+
+def _blend(base, layer, mode):
+    """按混合模式合成 (输入输出均为 0~255 的整数数组)"""
+    if mode == "normal":
+        return layer
+    # 以下模式的中间乘积超过 int16 范围, 使用 int32
+    base = base.astype(np.int32)
+    layer = layer.astype(np.int32)
+    if mode == "multiply":
+        result = base * layer // 255
+    elif mode == "screen":
+        result = 255 - (255 - base) * (255 - layer) // 255
+    elif mode == "overlay":
+        result = np.where(
+            base < 128,
+            2 * base * layer // 255,
+            255 - 2 * (255 - base) * (255 - layer) // 255
+        )
+    elif mode == "soft-light":
+        # Pegtop 公式: (1 - 2b)a² + 2ab
+        result = ((255 - 2 * layer) * base // 255 * base + 2 * layer * base) // 255
+    else:
+        raise ValueError(f"未知的混合模式: {mode}")
+    return result
+
+
+def apply_morandi_tone(image, r_shift, g_shift, b_shift, saturation=0.7, strength=1.0, blend="normal"):
+    """应用莫兰迪色调 (NumPy 实现)
+    
+    strength 为滤镜强度 (0~1), blend 为调色结果与原图的混合模式。
+    """
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy 后端需要安装 numpy")
+    if blend not in BLEND_MODES:
+        raise ValueError(f"未知的混合模式: {blend}")
+    if not 0.0 <= strength <= 1.0:
+        # 混合在 int16 中计算, 强度超过 1 会溢出
+        raise ValueError(f"滤镜强度应在 0~1 之间: {strength}")
+    
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    # 饱和度不超过 1 时所有中间值都在 int16 范围内
+    dtype = np.int16 if saturation <= 1.0 else np.int32
+    base = np.asarray(image).astype(dtype)
+    
+    # 亮度 (7 位定点)
+    r, g, b = LUMA_WEIGHTS_Q7
+    luma = (base[..., 0] * r + base[..., 1] * g + base[..., 2] * b + 64) >> 7
+    luma = luma[..., np.newaxis]
+    
+    # 降饱和 + 色调偏移, 原地运算后显式截断到 0~255
+    toned = np.subtract(base, luma)
+    toned *= _q7(saturation)
+    toned += 64
+    toned >>= 7
+    toned += luma
+    toned += np.array((r_shift, g_shift, b_shift), dtype=dtype)
+    np.clip(toned, 0, 255, out=toned)
+    
+    if blend != "normal" or strength != 1.0:
+        layer = _blend(base, toned, blend).astype(dtype)
+        toned = base + (((layer - base) * _q7(strength) + 64) >> 7)
+        np.clip(toned, 0, 255, out=toned)
+    
+    return Image.fromarray(toned.astype(np.uint8), "RGB")
@@ -0,0 +1,16 @@
+"""
+Paths
+应用共用的用户目录
+"""
+
+import os
+
+
+def user_cache_dir(name):
+    """用户缓存目录下名为 name 的子目录 (Windows 下位于 %LOCALAPPDATA%)"""
+    base = (
+        os.environ.get("LOCALAPPDATA")
+        or os.environ.get("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(base, name)
@@ -0,0 +1,130 @@
+"""
+Profiling
+热点路径计时 - 解码、各管线步骤、缩放、CTkImage 创建和 Tk 更新
+
+每个计时区间同时进入按名称的滚动窗口 (用于 p50/p95/p99) 和一个有上限的
+事件环形缓冲 (导出为 Chrome trace, 可在 chrome://tracing 或 Perfetto 中打开)。
+默认关闭, 关闭时 span() 只多一次属性判断; 设置环境变量 MORANDI_PROFILE=1
+启动时即开启。
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+WINDOW_SIZE = 512        # 每个名称保留的最近样本数
+TRACE_CAPACITY = 50000   # 保留的 trace 事件数
+
+
+class _Span:
+    """计时区间, 退出时记录到 Profiler"""
+    __slots__ = ("profiler", "name", "start")
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class _NullSpan:
+    """关闭时使用的空区间"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def percentile(ordered, fraction):
+    """已排序样本的分位数 (最近秩法)"""
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class Profiler:
+    """计时区间的收集器; 多线程同时记录是安全的 (deque.append 是原子的)"""
+    def __init__(self, enabled=False, window_size=WINDOW_SIZE, trace_capacity=TRACE_CAPACITY):
+        self.enabled = enabled
+        self.window_size = window_size
+        self.windows = {}   # 名称 -> deque[毫秒]
+        self.events = deque(maxlen=trace_capacity)   # (名称, 开始秒, 结束秒, 线程号)
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def span(self, name):
+        """with profiler.span("resize"): ..."""
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+    
+    def record(self, name, start, end):
+        window = self.windows.get(name)
+        if window is None:
+            with self._lock:
+                window = self.windows.setdefault(name, deque(maxlen=self.window_size))
+        window.append((end - start) * 1000)
+        self.events.append((name, start, end, threading.get_ident()))
+    
+    def reset(self):
+        with self._lock:
+            self.windows = {}
+            self.events.clear()
+    
+    def summary(self):
+        """返回 [(名称, 次数, p50, p95, p99)] (毫秒), 按 p95 从大到小排列"""
+        rows = []
+        for name, window in list(self.windows.items()):
+            ordered = sorted(window)
+            rows.append((name, len(ordered), percentile(ordered, 0.50),
+                         percentile(ordered, 0.95), percentile(ordered, 0.99)))
+        rows.sort(key=lambda row: row[3], reverse=True)
+        return rows
+    
+    def format_summary(self):
+        """等宽排版的摘要文本, 供界面浮层使用"""
+        lines = [f"{'span':<22}{'n':>5}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, count, p50, p95, p99 in self.summary():
+            lines.append(f"{name:<22}{count:>5}{p50:>8.2f}{p95:>8.2f}{p99:>8.2f}")
+        return "\n".join(lines)
+    
+    def export_chrome_trace(self, path):
+        """把事件缓冲写为 Chrome trace JSON (完整事件 "X", 时间单位为微秒)"""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for name, start, end, thread in list(self.events):
+            tid = threads.setdefault(thread, len(threads) + 1)
+            events.append({
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": pid,
+                "tid": tid,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+# 环境变量 MORANDI_PROFILE 是否要求启动即开启
+ENV_ENABLED = os.environ.get("MORANDI_PROFILE", "") not in ("", "0")
+
+# 全局实例, 供 morandi.core 和界面共用
+profiler = Profiler(enabled=ENV_ENABLED)
@@ -0,0 +1,82 @@
+"""
+Session
+多图片会话 - 每张图片保留预览代理和调整参数, 全分辨率像素放在有内存上限的 LRU 中
+
+切换图片只需换回代理图和参数, 不必重新解码; 全分辨率图片被淘汰后,
+导出时再用 load_full_image 按需重新解码。
+"""
+
+import os
+
+from morandi.core import STATS_SAMPLE_SIZE, AdjustmentPipeline
+from morandi.history import EditHistory, ImageLRU
+from morandi.viewport import Viewport
+
+FULL_IMAGE_BUDGET = 512 * 1024 * 1024   # 全分辨率图片 LRU 的内存预算 (字节)
+
+
+class FullImageCache(ImageLRU):
+    """全分辨率图片的 LRU 缓存, 按路径索引, 总字节数不超过预算"""
+    def __init__(self, budget=FULL_IMAGE_BUDGET):
+        super().__init__(budget)
+
+
+class ImageSession:
+    """一张已打开的图片: 预览金字塔、调整参数、撤销历史、预览渲染缓存和缩放状态"""
+    def __init__(self, path, pyramid, image_size, preview_size, snapshots=None):
+        self.path = path
+        self.pyramid = pyramid
+        self.image_size = image_size
+        self.preview_source = pyramid.level_for(preview_size)
+        self.stats_reference = pyramid.level_for((STATS_SAMPLE_SIZE, STATS_SAMPLE_SIZE))
+        self.signature = AdjustmentPipeline().signature()
+        self.history = EditHistory(snapshots=snapshots)
+        self.history.reset(self.signature)
+        self.level_renders = {}   # 层级尺寸 -> (层级, 参数, 渲染结果)
+        self.viewport = Viewport(image_size)
+    
+    def release_full_resolution(self):
+        """丢弃金字塔中比预览代理更大的层级, 返回其中的全分辨率底图 (没有则为 None)
+        
+        会话转入后台时调用, 全分辨率像素交给 FullImageCache 管理。
+        """
+        levels = self.pyramid.levels
+        index = next(i for i, level in enumerate(levels) if level is self.preview_source)
+        base = levels[0]
+        del levels[:index]
+        return base if index and base.size == tuple(self.image_size) else None
+
+
+class SessionList:
+    """按打开顺序排列的会话, 记录当前会话"""
+    def __init__(self):
+        self.sessions = []
+        self.active = None
+    
+    def find(self, path):
+        """按路径查找已打开的会话"""
+        path = os.path.normcase(os.path.abspath(path))
+        for session in self.sessions:
+            if os.path.normcase(os.path.abspath(session.path)) == path:
+                return session
+        return None
+    
+    def add(self, session):
+        self.sessions.append(session)
+    
+    def remove(self, session):
+        """关闭会话, 返回关闭后应切换到的会话 (没有则为 None)"""
+        index = self.sessions.index(session)
+        self.sessions.remove(session)
+        if session is not self.active:
+            return self.active
+        self.active = None
+        if not self.sessions:
+            return None
+        return self.sessions[min(index, len(self.sessions) - 1)]
+    
+    def __len__(self):
+        return len(self.sessions)
+    
+    def __iter__(self):
+        return iter(self.sessions)
@@ -0,0 +1,58 @@
+"""
+Statistics
+直方图与颜色统计 - 在估计统计量用的小尺寸采样图上计算, 成本与原图尺寸无关
+
+均值和方差直接由 256 级直方图求得, 不再遍历像素;
+结果按 (层级, 参数) 缓存, 撤销、重做和切换图片时直接复用。
+"""
+
+from morandi.history import ImageLRU
+
+CHANNELS = ("R", "G", "B", "L")
+
+
+def histogram_moments(histogram):
+    """由 256 级直方图计算 (均值, 方差)"""
+    count = sum(histogram)
+    if not count:
+        return 0.0, 0.0
+    mean = sum(value * n for value, n in enumerate(histogram)) / count
+    variance = sum((value - mean) ** 2 * n for value, n in enumerate(histogram)) / count
+    return mean, variance
+
+
+class ColorStatistics:
+    """RGB 与亮度的直方图、均值和方差"""
+    def __init__(self, image):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        rgb = image.histogram()
+        self.histograms = (rgb[0:256], rgb[256:512], rgb[512:768], image.convert("L").histogram())
+        moments = [histogram_moments(histogram) for histogram in self.histograms]
+        self.means = tuple(mean for mean, _ in moments)
+        self.variances = tuple(variance for _, variance in moments)
+    
+    def summary(self):
+        """信息栏使用的简短文本: 亮度均值与标准差"""
+        return f"μ {self.means[3]:.0f}  σ {self.variances[3] ** 0.5:.0f}"
+
+
+class StatisticsCache(ImageLRU):
+    """按 (采样图, 参数) 缓存 ColorStatistics, 以采样图对象身份区分图片; 预算按条目数计
+    
+    在后台线程计算, 所有操作都加锁 (由 ImageLRU 负责)。
+    """
+    def __init__(self, max_entries=256):
+        super().__init__(max_entries)
+    
+    def size_of(self, statistics):
+        return 1
+    
+    def get(self, level, signature, render):
+        """取统计结果; 未命中时用 render() 得到采样图的渲染结果再计算"""
+        key = (id(level), signature)
+        statistics = super().get(key, level)
+        if statistics is None:
+            statistics = ColorStatistics(render())
+            self.put(key, statistics, level)
+        return statistics
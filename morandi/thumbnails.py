@@ -0,0 +1,180 @@
+"""
+Thumbnails
+文件夹缩略图 - 后台索引目录并生成缩略图, 结果持久化到磁盘缓存
+
+缓存以 (路径, 修改时间, 文件大小, 缩略图尺寸) 为键, 文件改动后自动失效;
+JPEG 用 draft() 在 DCT 域缩小解码, 上万张图片的文件夹也能很快建好索引。
+"""
+
+import hashlib
+import os
+import queue
+import threading
+
+from PIL import Image
+
+from morandi.core import IMAGE_EXTENSIONS
+from morandi.diskcache import DiskCache
+from morandi.export import atomic_write
+from morandi.paths import user_cache_dir
+
+THUMBNAIL_SIZE = 128
+
+
+def default_cache_dir():
+    """缩略图缓存目录"""
+    return user_cache_dir("morandi_thumbnails")
+
+
+def list_images(folder):
+    """列出文件夹中的图片 (不递归), 按文件名排序"""
+    with os.scandir(folder) as entries:
+        paths = [
+            entry.path for entry in entries
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()
+        ]
+    paths.sort(key=lambda path: os.path.basename(path).lower())
+    return paths
+
+
+def make_file_thumbnail(path, size=THUMBNAIL_SIZE):
+    """解码并缩小一张图片; JPEG 只按接近 size 的比例解码"""
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size), Image.Resampling.BILINEAR)
+        return image.convert("RGB")
+
+
+class ThumbnailCache(DiskCache):
+    """缩略图的磁盘缓存, 每个缩略图一个 JPEG 文件, 按前两位哈希分目录
+    
+    总大小超过 max_bytes 时按写入时间淘汰最旧的文件; 淘汰需要遍历目录,
+    只在每写入 EVICT_INTERVAL 个文件后执行一次。
+    """
+    SUFFIX = ".jpg"
+    EVICT_INTERVAL = 256
+    
+    def __init__(self, directory=None, size=THUMBNAIL_SIZE, max_bytes=256 * 1024 * 1024):
+        super().__init__(directory or default_cache_dir(), max_bytes)
+        self.size = size
+        self._stores = 0
+    
+    def key(self, path):
+        """(绝对路径, 修改时间, 文件大小, 缩略图尺寸) 的哈希; 文件不存在时抛出 OSError"""
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size}"
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+    
+    def path_for(self, key):
+        return os.path.join(self.directory, key[:2], key + self.SUFFIX)
+    
+    def load(self, key):
+        """读取缓存的缩略图, 不存在或已损坏时返回 None"""
+        path = self.path_for(key)
+        try:
+            with Image.open(path) as image:
+                image.load()
+        except (OSError, SyntaxError):
+            return None
+        return image
+    
+    def store(self, key, thumbnail):
+        """原子写入一张缩略图"""
+        path = self.path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path) as f:
+                thumbnail.save(f, "JPEG", quality=85)
+        except OSError as e:
+            print(f"写入缩略图缓存失败: {e}")
+            return
+        self._stores += 1
+        if self._stores % self.EVICT_INTERVAL == 0:
+            self.evict()
+    
+    def get(self, path):
+        """取缩略图: 命中缓存直接读取, 否则生成并写入缓存"""
+        key = self.key(path)
+        thumbnail = self.load(key)
+        if thumbnail is None:
+            thumbnail = make_file_thumbnail(path, self.size)
+            self.store(key, thumbnail)
+        return thumbnail
+    
+    def ensure(self, path):
+        """确保缓存中有这张图片的缩略图 (预热用, 命中时不读取文件)"""
+        key = self.key(path)
+        if not os.path.exists(self.path_for(key)):
+            self.store(key, make_file_thumbnail(path, self.size))
+
+
+class FolderIndexer:
+    """后台索引一个文件夹: 先列出图片, 再逐个生成缩略图
+    
+    request() 提交的路径 (通常是当前可见的行) 优先处理, 越晚提交越先处理,
+    结果放入 results 队列 (路径, 缩略图或异常), 由界面线程轮询取出;
+    没有请求时按顺序为其余图片预热磁盘缓存, 预热结果不放入队列。
+    列表完成时放入 (None, 路径列表), 失败时放入 (None, 异常)。
+    """
+    def __init__(self, folder, cache):
+        self.folder = folder
+        self.cache = cache
+        self.results = queue.Queue()
+        self._wanted = []             # 请求的路径 (栈)
+        self._pending = set()         # 已请求尚未交付的路径, 避免重复处理
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="morandi-indexer", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+    
+    def request(self, paths):
+        """优先为这些路径生成缩略图"""
+        with self._condition:
+            for path in reversed(paths):
+                if path not in self._pending:
+                    self._pending.add(path)
+                    self._wanted.append(path)
+            self._condition.notify()
+    
+    def _next(self, backlog):
+        """取下一条路径, 返回 (路径, 是否交付); 请求为空且预热完成时等待"""
+        with self._condition:
+            while not self._stopped:
+                if self._wanted:
+                    return self._wanted.pop(), True
+                for path in backlog:
+                    return path, False
+                self._condition.wait()
+            return None, False
+    
+    def _run(self):
+        try:
+            paths = list_images(self.folder)
+        except OSError as e:
+            self.results.put((None, e))
+            return
+        self.results.put((None, paths))
+        backlog = iter(paths)
+        while True:
+            path, deliver = self._next(backlog)
+            if path is None:
+                return
+            try:
+                if not deliver:
+                    self.cache.ensure(path)
+                    continue
+                result = self.cache.get(path)
+            except Exception as e:
+                if not deliver:
+                    continue
+                result = e
+            with self._condition:
+                self._pending.discard(path)
+            self.results.put((path, result))
@@ -0,0 +1,159 @@
+"""
+Viewport
+缩放与平移 - 只渲染显示区域内可见的部分
+
+放大查看时在分辨率刚好够用的金字塔层级上按块 crop, 再执行颜色变换, 每帧的成本只与
+视口大小有关, 与原图尺寸无关; 变换后的块按 (层级, 参数, 块坐标) 缓存, 平移时只渲染
+新露出的块。颜色变换是逐像素的 (对比度中心在编译时已由采样图确定), 分块结果与整图一致。
+"""
+
+import math
+
+from PIL import Image
+
+from morandi.history import ImageLRU
+from morandi.profiling import profiler
+
+PREVIEW_TILE_SIZE = 256
+TILE_BUDGET = 64 * 1024 * 1024   # 预览块缓存的内存预算 (字节)
+MAX_ZOOM = 8.0                   # 最大放大倍数 (相对原图)
+ZOOM_STEP = 1.25                 # 滚轮每格的缩放倍数
+
+
+class TileCache(ImageLRU):
+    """预览块的缓存, 按 (层级, 参数, 块坐标) 索引; 以层级对象的身份区分图片"""
+    def __init__(self, budget=TILE_BUDGET):
+        super().__init__(budget)
+    
+    def get(self, level, signature, tile):
+        return super().get((id(level), signature, tile), level)
+    
+    def put(self, level, signature, tile, image):
+        super().put((id(level), signature, tile), image, level)
+
+
+class Viewport:
+    """一张图片的缩放与平移状态, 坐标以原图像素为单位
+    
+    zoom 为 None 表示适应显示区域, 否则为相对原图的缩放倍数 (1.0 即 1:1);
+    center 是显示区域中心对应的原图坐标。
+    """
+    def __init__(self, image_size):
+        self.image_size = tuple(image_size)
+        self.zoom = None
+        self.center = (self.image_size[0] / 2, self.image_size[1] / 2)
+    
+    def fit_scale(self, display_size):
+        return min(display_size[0] / self.image_size[0], display_size[1] / self.image_size[1])
+    
+    def scale(self, display_size):
+        """当前的显示倍数"""
+        return self.zoom if self.zoom is not None else self.fit_scale(display_size)
+    
+    def fit(self):
+        self.zoom = None
+        self.center = (self.image_size[0] / 2, self.image_size[1] / 2)
+    
+    def set_zoom(self, zoom, display_size, anchor=(0, 0)):
+        """缩放到 zoom 倍; anchor 是保持不动的点相对显示区域中心的偏移 (像素)
+        
+        不大于适应倍数时回到适应显示区域。
+        """
+        zoom = min(zoom, MAX_ZOOM)
+        if zoom <= self.fit_scale(display_size):
+            self.fit()
+            return
+        scale = self.scale(display_size)
+        x = self.center[0] + anchor[0] / scale
+        y = self.center[1] + anchor[1] / scale
+        self.zoom = zoom
+        self.center = self.clamped((x - anchor[0] / zoom, y - anchor[1] / zoom), display_size)
+    
+    def zoom_by(self, factor, display_size, anchor=(0, 0)):
+        self.set_zoom(self.scale(display_size) * factor, display_size, anchor)
+    
+    def pan(self, dx, dy, display_size):
+        """按显示像素平移, 图片随拖动方向移动"""
+        if self.zoom is not None:
+            center = (self.center[0] - dx / self.zoom, self.center[1] - dy / self.zoom)
+            self.center = self.clamped(center, display_size)
+    
+    def clamped(self, center, display_size):
+        """限制视口不超出图片; 某一方向上图片比视口小时在该方向居中"""
+        scale = self.scale(display_size)
+        result = []
+        for value, extent, view in zip(center, self.image_size, display_size):
+            half = view / scale / 2
+            result.append(extent / 2 if half * 2 >= extent else min(max(value, half), extent - half))
+        return tuple(result)
+    
+    def region(self, display_size):
+        """返回 (可见区域, 输出尺寸); 可见区域为原图中的浮点坐标 (左, 上, 右, 下)"""
+        scale = self.scale(display_size)
+        center = self.clamped(self.center, display_size)
+        box = []
+        size = []
+        for value, extent, view in zip(center, self.image_size, display_size):
+            half = min(view / scale, extent) / 2
+            box.append((value - half, value + half))
+            size.append(max(1, round(half * 2 * scale)))
+        (left, right), (top, bottom) = box
+        return (left, top, right, bottom), tuple(size)
+
+
+def choose_level(levels, image_size, scale):
+    """分辨率不低于 scale 的最小层级, 都不够时用最大的一级; 返回 (层级, 层级相对原图的倍数)"""
+    best = levels[0]
+    for level in levels:
+        if level.width / image_size[0] < scale:
+            break
+        best = level
+    return best, best.width / image_size[0]
+
+
+def levels_above(image, base):
+    """从全分辨率图片逐级缩小到 base 之前的各级 (金字塔只有缩小解码的层级时补到链首)"""
+    levels = [image]
+    while levels[-1].width // 2 > base.width:
+        with profiler.span("resize.reduce"):
+            levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def render_region(level, level_scale, box, output_size, transform, tiles, signature,
+                  final=False, tile_size=PREVIEW_TILE_SIZE):
+    """渲染原图坐标中的 box 区域并缩放到 output_size
+    
+    只对覆盖该区域的块执行颜色变换, 结果存入 tiles (TileCache); final 时用 LANCZOS 缩放。
+    """
+    left, top, right, bottom = (value * level_scale for value in box)
+    left, top = max(0.0, left), max(0.0, top)
+    right, bottom = min(float(level.width), right), min(float(level.height), bottom)
+    first_column, first_row = int(left // tile_size), int(top // tile_size)
+    last_column = max(first_column, math.ceil(right / tile_size) - 1)
+    last_row = max(first_row, math.ceil(bottom / tile_size) - 1)
+    origin_x, origin_y = first_column * tile_size, first_row * tile_size
+    mosaic = Image.new("RGB", (
+        min(level.width, (last_column + 1) * tile_size) - origin_x,
+        min(level.height, (last_row + 1) * tile_size) - origin_y,
+    ))
+    for row in range(first_row, last_row + 1):
+        for column in range(first_column, last_column + 1):
+            tile = tiles.get(level, signature, (column, row))
+            if tile is None:
+                x, y = column * tile_size, row * tile_size
+                crop_box = (x, y, min(x + tile_size, level.width), min(y + tile_size, level.height))
+                with profiler.span("viewport.tile"):
+                    tile = transform.apply(level.crop(crop_box))
+                tiles.put(level, signature, (column, row), tile)
+            mosaic.paste(tile, (column * tile_size - origin_x, row * tile_size - origin_y))
+    
+    source_box = (left - origin_x, top - origin_y, right - origin_x, bottom - origin_y)
+    whole = tuple(round(value) for value in source_box)
+    if (whole[2] - whole[0], whole[3] - whole[1]) == tuple(output_size) and all(
+        abs(value - rounded) < 1e-6 for value, rounded in zip(source_box, whole)
+    ):
+        return mosaic.crop(whole)
+    resample = Image.Resampling.LANCZOS if final else Image.Resampling.BILINEAR
+    with profiler.span("viewport.resize"):
+        return mosaic.resize(output_size, resample, box=source_box)
@@ -4,11 +4,35 @@ Morandi Color Palette Image Processing App
 """
 
 import customtkinter as ctk
-from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageEnhance, ImageOps, ImageSequence
+from PIL import ImageTk, ImageDraw, ImageFilter, ImageOps
 import os
 import sys
+import queue
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import tkinter
 from tkinter import filedialog
 import ctypes
+from collections import OrderedDict
+
+try:
+    from tkinterdnd2 import DND_FILES, TkinterDnD
+except ImportError:
+    TkinterDnD = None
+
+from animated_gif import AnimatedGIF
+from morandi.core import (
+    IMAGE_EXTENSIONS, AdjustmentPipeline, MipChain, MorandiFilters,
+    fit_size, load_full_image, load_image, make_thumbnail, render_filter_thumbnail
+)
+from morandi.export import EncoderOptions, export_image, format_for, format_size
+from morandi.history import EditHistory, SnapshotCache
+from morandi.profiling import ENV_ENABLED, profiler
+from morandi.stats import StatisticsCache
+from morandi.session import FullImageCache, ImageSession, SessionList
+from morandi.thumbnails import THUMBNAIL_SIZE, FolderIndexer, ThumbnailCache
+from morandi.viewport import ZOOM_STEP, TileCache, choose_level, levels_above, render_region
 
 # 设置外观模式
 ctk.set_appearance_mode("light")
@@ -42,48 +66,527 @@ class MorandiColors:
     ACCENT_HOVER = "#A69285"   # 悬停色
 
 
-class AnimatedGIF:
-    """处理GIF动画的类"""
-    def __init__(self, label, gif_path, size=(60, 60)):
-        self.label = label
-        self.size = size
-        self.frames = []
-        self.durations = []
-        self.current_frame = 0
-        self.is_playing = True
-        
+# ========== 后台处理 ==========
+class ImageWorker:
+    """后台图片处理执行器 - 线程池 (PIL 处理时会释放 GIL)
+    
+    任务按通道区分: 同一通道提交新任务时, 尚未开始的旧任务被取消,
+    已在运行的旧任务结果被丢弃。结果经队列由 after() 轮询交回 Tk 主线程。
+    """
+    POLL_INTERVAL = 15  # 毫秒
+    
+    def __init__(self, widget, max_workers=None):
+        self.widget = widget
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="morandi-worker"
+        )
+        self.results = queue.Queue()
+        self.generations = {}
+        self.futures = {}
+        self.poll_id = None
+    
+    def submit(self, channel, func, *args, on_done=None, on_error=None):
+        """提交任务, 返回该任务的代号"""
+        generation = self.generations.get(channel, 0) + 1
+        self.generations[channel] = generation
+        previous = self.futures.get(channel)
+        if previous:
+            previous.cancel()
+        self.futures[channel] = self.executor.submit(
+            self._run, channel, generation, func, args, on_done, on_error
+        )
+        if self.poll_id is None:
+            self.poll_id = self.widget.after(self.POLL_INTERVAL, self._poll)
+        return generation
+    
+    def cancel(self, channel):
+        """放弃通道中的任务: 尚未开始的取消, 已在运行的结果被丢弃"""
+        self.generations[channel] = self.generations.get(channel, 0) + 1
+        future = self.futures.pop(channel, None)
+        if future:
+            future.cancel()
+    
+    def is_current(self, channel, generation):
+        """任务是否仍是该通道最新的任务 (供长任务主动放弃)"""
+        return self.generations.get(channel) == generation
+    
+    def is_busy(self, channel=None):
+        channels = [channel] if channel else list(self.futures)
+        return any(not self.futures[c].done() for c in channels if c in self.futures)
+    
+    def _run(self, channel, generation, func, args, on_done, on_error):
+        """在工作线程中执行"""
         try:
-            gif = Image.open(gif_path)
-            for frame in ImageSequence.Iterator(gif):
-                pil_frame = frame.copy().convert("RGBA")
-                pil_frame = pil_frame.resize(size, Image.Resampling.LANCZOS)
-                ctk_image = ctk.CTkImage(light_image=pil_frame, dark_image=pil_frame, size=size)
-                self.frames.append(ctk_image)
-                duration = gif.info.get('duration', 100)
-                self.durations.append(duration if duration > 0 else 100)
+            result = func(*args)
         except Exception as e:
-            print(f"加载GIF失败: {e}")
-            self.frames = []
-    
-    def animate(self):
-        if self.frames and self.is_playing:
-            self.label.configure(image=self.frames[self.current_frame])
-            self.current_frame = (self.current_frame + 1) % len(self.frames)
-            duration = self.durations[self.current_frame] if self.durations else 100
-            self.label.after(duration, self.animate)
-    
-    def start(self):
-        if self.frames:
-            self.is_playing = True
-            self.animate()
-    
-    def stop(self):
-        self.is_playing = False
+            self.results.put((channel, generation, on_error, e))
+        else:
+            self.results.put((channel, generation, on_done, result))
+    
+    def _poll(self):
+        """在主线程中分发已完成任务的结果"""
+        self.poll_id = None
+        while True:
+            try:
+                channel, generation, callback, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if callback and self.is_current(channel, generation):
+                callback(result)
+        if self.is_busy() or not self.results.empty():
+            self.poll_id = self.widget.after(self.POLL_INTERVAL, self._poll)
+    
+    def shutdown(self):
+        """取消所有任务并关闭线程池"""
+        if self.poll_id is not None:
+            self.widget.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class DisplaySurface:
+    """可复用的显示表面 - 每种尺寸保留一个 PhotoImage, 尺寸不变时用 paste 原地更新像素
+    
+    拖动滑块时每帧只上传像素, 不再新建 CTkImage / PhotoImage, 也不必重新 configure 标签。
+    图片按物理像素显示 (显示尺寸本来就由 winfo_width 的物理像素算出), 不再经过 CTkImage 的缩放。
+    """
+    MAX_SIZES = 2   # 保留的尺寸数: 当前尺寸和上一个尺寸 (窗口来回调整时复用)
+    
+    def __init__(self, label):
+        self.label = label
+        self.photos = OrderedDict()   # 尺寸 -> ImageTk.PhotoImage
+        self.current = None
+        self.allocations = 0
+        self.frames = 0
+    
+    def show(self, image):
+        """显示图片; 只在出现新尺寸时分配 PhotoImage"""
+        photo = self.photos.get(image.size)
+        if photo is None:
+            with profiler.span("display.allocate"):
+                photo = ImageTk.PhotoImage("RGB", image.size)
+            self.photos[image.size] = photo
+            self.allocations += 1
+            while len(self.photos) > self.MAX_SIZES:
+                self.photos.popitem(last=False)
+        else:
+            self.photos.move_to_end(image.size)
+        with profiler.span("display.paste"):
+            photo.paste(image)
+        if photo is not self.current:
+            with profiler.span("display.configure"), warnings.catch_warnings():
+                # CTkLabel 对非 CTkImage 的图片给出 HighDPI 警告, 这里按物理像素显示是有意为之
+                warnings.simplefilter("ignore")
+                self.label.configure(image=photo, text="")
+            self.current = photo
+        self.frames += 1
+    
+    def clear(self):
+        """移除图片; PhotoImage 被回收时 Tk 中的图片随之删除"""
+        self.label.configure(image=None)
+        self.current = None
+        self.photos.clear()
+
+
+class FittedPreviewCache:
+    """当前预览按尺寸档位缓存的高质量缩放结果
+    
+    档位是 BUCKET 像素的网格: 调整窗口期间落在同一档位的尺寸直接复用缓存结果
+    (相差不到一个档位), 停下后才按精确尺寸重新缩放; 预览结果变化时全部失效。
+    只在主线程使用。
+    """
+    BUCKET = 16
+    MAX_ENTRIES = 8
+    
+    def __init__(self):
+        self.chain = None
+        self._items = OrderedDict()   # 档位 -> 缩放结果
+    
+    def bucket(self, size):
+        return size[0] // self.BUCKET, size[1] // self.BUCKET
+    
+    def get(self, chain, size):
+        """取 size 所在档位的缩放结果, 没有则返回 None"""
+        if chain is not self.chain:
+            return None
+        key = self.bucket(size)
+        image = self._items.get(key)
+        if image is not None:
+            self._items.move_to_end(key)
+        return image
+    
+    def put(self, chain, image):
+        if chain is not self.chain:
+            self.chain = chain
+            self._items.clear()
+        self._items[self.bucket(image.size)] = image
+        while len(self._items) > self.MAX_ENTRIES:
+            self._items.popitem(last=False)
+    
+    def clear(self):
+        self.chain = None
+        self._items.clear()
+
+
+class RenderScheduler:
+    """渲染调度器 - 合并滑块事件, 每个显示刷新周期最多渲染一帧
+    
+    拖动期间只渲染最新请求的状态 (交互质量), 同一时刻最多一帧在渲染;
+    停止拖动 settle_delay 毫秒后补一帧高质量渲染。
+    """
+    def __init__(self, widget, render, fps=60, settle_delay=150):
+        self.widget = widget
+        self.render = render              # render(final) 在主线程调用, 完成后需调用 frame_done()
+        self.frame_interval = max(1, int(1000 / fps))
+        self.settle_delay = settle_delay
+        self.pending = None               # None / "interactive" / "final"
+        self.in_flight = False
+        self.frame_id = None
+        self.settle_id = None
+        self.last_frame_time = 0.0
+        self.requested_frames = 0
+        self.rendered_frames = 0
+        self.dropped_frames = 0
+    
+    def request(self, final=False):
+        """请求渲染当前状态; final=True 用于点击类操作, 直接高质量渲染"""
+        self.requested_frames += 1
+        if self.pending:
+            self.dropped_frames += 1
+        if self.settle_id is not None:
+            self.widget.after_cancel(self.settle_id)
+            self.settle_id = None
+        if final:
+            self.pending = "final"
+        else:
+            self.pending = "interactive"
+            self.settle_id = self.widget.after(self.settle_delay, self._settle)
+        self._schedule()
+    
+    def _schedule(self):
+        if self.frame_id is None and not self.in_flight and self.pending:
+            elapsed = (time.perf_counter() - self.last_frame_time) * 1000
+            delay = max(0, int(self.frame_interval - elapsed))
+            self.frame_id = self.widget.after(delay, self._frame)
+    
+    def _frame(self):
+        self.frame_id = None
+        if not self.pending or self.in_flight:
+            return
+        final = self.pending == "final"
+        self.pending = None
+        self.in_flight = True
+        self.last_frame_time = time.perf_counter()
+        self.render(final)
+    
+    def _settle(self):
+        """停止拖动后补一帧高质量渲染"""
+        self.settle_id = None
+        self.pending = "final"
+        self._schedule()
+    
+    def frame_done(self):
+        """一帧渲染完成 (成功或失败) 时由调用方通知"""
+        self.in_flight = False
+        self.rendered_frames += 1
+        self._schedule()
+    
+    def cancel(self):
+        """取消待渲染的帧; 已提交的帧由调用方在 ImageWorker 中放弃"""
+        for after_id in (self.frame_id, self.settle_id):
+            if after_id is not None:
+                self.widget.after_cancel(after_id)
+        self.frame_id = self.settle_id = None
+        self.pending = None
+        self.in_flight = False
+    
+    def stats(self):
+        """渲染统计, 用于诊断"""
+        return {
+            "requested": self.requested_frames,
+            "rendered": self.rendered_frames,
+            "dropped": self.dropped_frames,
+        }
+
+
+class ExportOptionsDialog(ctk.CTkToplevel):
+    """导出选项对话框 - 只显示与目标格式相关的编码器选项"""
+    
+    def __init__(self, master, format, options):
+        super().__init__(master)
+        self.title(f"导出 {format}")
+        self.configure(fg_color=MorandiColors.BG_LIGHT)
+        self.resizable(False, False)
+        self.transient(master)
+        self.result = None
+        self.format = format
+        self.options = options
+        
+        body = ctk.CTkFrame(self, fg_color="transparent")
+        body.pack(fill="both", expand=True, padx=20, pady=15)
+        
+        self.quality_slider = None
+        self.compress_slider = None
+        self.optimize_var = ctk.BooleanVar(value=options.optimize)
+        self.progressive_var = ctk.BooleanVar(value=options.progressive)
+        
+        if format in ("JPEG", "WEBP"):
+            self.quality_slider = self.add_slider(body, "质量", 1, 100, options.quality)
+        if format == "JPEG":
+            for text, variable in (("优化编码 (更小, 稍慢)", self.optimize_var), ("渐进式", self.progressive_var)):
+                ctk.CTkCheckBox(
+                    body,
+                    text=text,
+                    variable=variable,
+                    font=ctk.CTkFont(size=12),
+                    text_color=MorandiColors.TEXT_SECONDARY,
+                    fg_color=MorandiColors.TAUPE,
+                    hover_color=MorandiColors.ACCENT_HOVER
+                ).pack(anchor="w", pady=4)
+        if format in ("PNG", "WEBP"):
+            top = 9 if format == "PNG" else 6
+            self.compress_slider = self.add_slider(body, "压缩级别", 0, top, min(top, options.compress_level))
+        
+        buttons = ctk.CTkFrame(body, fg_color="transparent")
+        buttons.pack(fill="x", pady=(12, 0))
+        for text, command, color in (("保存", self.accept, MorandiColors.SAGE_GREEN),
+                                     ("取消", self.destroy, MorandiColors.WARM_GRAY)):
+            ctk.CTkButton(
+                buttons,
+                text=text,
+                width=90,
+                height=32,
+                corner_radius=16,
+                fg_color=color,
+                hover_color=MorandiColors.TAUPE,
+                text_color="#ffffff",
+                command=command
+            ).pack(side="right", padx=(8, 0))
+        
+        self.bind("<Return>", lambda e: self.accept())
+        self.bind("<Escape>", lambda e: self.destroy())
+    
+    def add_slider(self, parent, text, low, high, value):
+        """带数值标签的整数滑块"""
+        label = ctk.CTkLabel(parent, text=f"{text}: {value}", font=ctk.CTkFont(size=12),
+                             text_color=MorandiColors.TEXT_SECONDARY)
+        label.pack(anchor="w", pady=(5, 2))
+        slider = ctk.CTkSlider(
+            parent,
+            from_=low,
+            to=high,
+            number_of_steps=high - low,
+            progress_color=MorandiColors.ROSE_GRAY,
+            button_color=MorandiColors.TAUPE,
+            button_hover_color=MorandiColors.ACCENT_HOVER,
+            command=lambda v: label.configure(text=f"{text}: {int(v)}")
+        )
+        slider.set(value)
+        slider.pack(fill="x", pady=(0, 8))
+        return slider
+    
+    def accept(self):
+        """按当前控件状态生成新的 EncoderOptions"""
+        options = self.options
+        self.result = EncoderOptions(
+            quality=int(self.quality_slider.get()) if self.quality_slider else options.quality,
+            optimize=self.optimize_var.get(),
+            progressive=self.progressive_var.get(),
+            compress_level=int(self.compress_slider.get()) if self.compress_slider else options.compress_level
+        )
+        self.destroy()
+    
+    def show(self):
+        """模态显示, 返回 EncoderOptions; 取消时返回 None"""
+        self.grab_set()
+        self.wait_window()
+        return self.result
+
+
+class FolderBrowser(ctk.CTkToplevel):
+    """文件夹浏览器 - 虚拟网格, 画布上只保留可见行的项目
+    
+    目录列表和缩略图由 FolderIndexer 在后台生成, 可见行优先;
+    结果经队列由 after() 轮询交回 Tk 主线程。双击打开图片。
+    """
+    CELL_WIDTH = THUMBNAIL_SIZE + 24
+    CELL_HEIGHT = THUMBNAIL_SIZE + 34
+    POLL_INTERVAL = 30      # 毫秒
+    POLL_BATCH = 48         # 每次轮询最多处理的缩略图数, 保持滚动流畅
+    PHOTO_CACHE = 600       # 保留的 PhotoImage 数量, 远大于一屏
+    
+    def __init__(self, master, folder, cache, on_open):
+        super().__init__(master)
+        self.title(f"🗂️ {folder}")
+        self.geometry("780x560")
+        self.configure(fg_color=MorandiColors.BG_LIGHT)
+        self.transient(master)
+        self.on_open = on_open
+        self.paths = []
+        self.index_of = {}
+        self.columns = 0
+        self.items = {}                  # 序号 -> (图片项目, 文字项目)
+        self.photos = OrderedDict()      # 路径 -> PhotoImage (LRU)
+        self.failed = set()
+        
+        self.status_label = ctk.CTkLabel(
+            self,
+            text="⏳ 正在索引…",
+            font=ctk.CTkFont(family="Segoe UI", size=12),
+            text_color=MorandiColors.TEXT_MUTED
+        )
+        self.status_label.pack(side="bottom", anchor="w", padx=12, pady=(0, 6))
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 6), pady=6)
+        self.canvas = tkinter.Canvas(
+            self,
+            bg=MorandiColors.CREAM,
+            highlightthickness=0,
+            yscrollincrement=self.CELL_HEIGHT // 4,
+            yscrollcommand=self.scrollbar.set
+        )
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(6, 0), pady=6)
+        
+        self.canvas.bind("<Configure>", lambda e: self.relayout())
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_units(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_units(-1))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_units(1))
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        
+        self.indexer = FolderIndexer(folder, cache)
+        self.indexer.start()
+        self.poll_id = self.after(self.POLL_INTERVAL, self.poll)
+    
+    def relayout(self, force=False):
+        """按画布宽度计算列数; 列数变化时重建可见项目"""
+        columns = max(1, self.canvas.winfo_width() // self.CELL_WIDTH)
+        if columns == self.columns and not force:
+            self.update_visible()
+            return
+        self.columns = columns
+        self.canvas.delete("all")
+        self.items = {}
+        rows = -(-len(self.paths) // columns)
+        self.canvas.configure(scrollregion=(0, 0, columns * self.CELL_WIDTH, rows * self.CELL_HEIGHT))
+        self.update_visible()
+    
+    def visible_range(self):
+        """当前可见 (含上下各一行余量) 的序号范围"""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // self.CELL_HEIGHT) - 1)
+        last_row = int(bottom // self.CELL_HEIGHT) + 1
+        return range(first_row * self.columns, min(len(self.paths), (last_row + 1) * self.columns))
+    
+    def update_visible(self):
+        """删除离开视口的项目, 为进入视口的行创建项目, 并请求缺失的缩略图"""
+        if not self.columns:
+            return
+        visible = self.visible_range()
+        for index in [index for index in self.items if index not in visible]:
+            for item in self.items.pop(index):
+                self.canvas.delete(item)
+        
+        missing = []
+        for index in visible:
+            if index in self.items:
+                continue
+            path = self.paths[index]
+            x = (index % self.columns) * self.CELL_WIDTH + self.CELL_WIDTH // 2
+            y = (index // self.columns) * self.CELL_HEIGHT
+            photo = self.photos.get(path)
+            if photo is not None:
+                self.photos.move_to_end(path)
+            elif path not in self.failed:
+                missing.append(path)
+            name = os.path.basename(path)
+            if len(name) > 18:
+                name = name[:17] + "…"
+            self.items[index] = (
+                self.canvas.create_image(x, y + 6 + THUMBNAIL_SIZE // 2, image=photo or ""),
+                self.canvas.create_text(
+                    x, y + THUMBNAIL_SIZE + 18, text=name,
+                    fill=MorandiColors.TEXT_SECONDARY, font=("Segoe UI", 9)
+                ),
+            )
+        if missing:
+            self.indexer.request(missing)
+    
+    def poll(self):
+        """在主线程中取出索引结果"""
+        self.poll_id = None
+        for _ in range(self.POLL_BATCH):
+            try:
+                path, result = self.indexer.results.get_nowait()
+            except queue.Empty:
+                break
+            if path is None:
+                self.on_listed(result)
+            elif isinstance(result, Exception):
+                self.failed.add(path)
+            else:
+                self.on_thumbnail(path, result)
+        self.poll_id = self.after(self.POLL_INTERVAL, self.poll)
+    
+    def on_listed(self, result):
+        """目录列表完成"""
+        if isinstance(result, Exception):
+            self.status_label.configure(text=f"⚠️ 无法读取文件夹: {result}")
+            return
+        self.paths = result
+        self.index_of = {path: index for index, path in enumerate(result)}
+        self.status_label.configure(text=f"📁 {len(result)} 张图片  ·  双击打开")
+        self.relayout(force=True)
+    
+    def on_thumbnail(self, path, thumbnail):
+        """缩略图就绪: 放入 PhotoImage LRU, 可见时立即显示"""
+        photo = ImageTk.PhotoImage(thumbnail)
+        self.photos[path] = photo
+        if len(self.photos) > self.PHOTO_CACHE:
+            self.photos.popitem(last=False)
+        item = self.items.get(self.index_of.get(path))
+        if item:
+            self.canvas.itemconfigure(item[0], image=photo)
+    
+    def on_scroll(self, *args):
+        self.canvas.yview(*args)
+        self.update_visible()
+    
+    def scroll_units(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self.update_visible()
+    
+    def on_double_click(self, event):
+        """双击打开所点的图片"""
+        column = int(self.canvas.canvasx(event.x) // self.CELL_WIDTH)
+        index = int(self.canvas.canvasy(event.y) // self.CELL_HEIGHT) * self.columns + column
+        if column < self.columns and index < len(self.paths):
+            self.on_open([self.paths[index]])
+    
+    def close(self):
+        self.indexer.stop()
+        if self.poll_id is not None:
+            self.after_cancel(self.poll_id)
+        self.destroy()
 
 
 class MorandiImageApp(ctk.CTk):
     """莫兰迪色系图片处理应用"""
     
+    PREVIEW_FPS = 60          # 拖动滑块时的最高预览帧率
+    IDLE_RENDER_DELAY = 150   # 停止操作多久后以 LANCZOS 高质量重绘 (毫秒)
+    THUMBNAIL_SIZE = 52       # 滤镜预览条缩略图边长
+    HISTORY_BUDGET = 64 * 1024 * 1024   # 撤销历史中预览快照的内存预算 (字节), 所有图片共用
+    FULL_IMAGE_BUDGET = 512 * 1024 * 1024   # 全分辨率图片 LRU 的内存预算 (字节)
+    FILMSTRIP_SIZE = 48       # 图片胶片条缩略图边长
+    HISTOGRAM_SIZE = (160, 28)   # 信息栏直方图尺寸
+    HISTOGRAM_BINS = 64
+    PROFILE_REFRESH = 500     # 性能浮层的刷新间隔 (毫秒)
+    HISTOGRAM_COLORS = ("#C08A86", "#8FA888", "#86A0B8", MorandiColors.TEXT_PRIMARY)   # R G B 亮度
+    
     def __init__(self):
         super().__init__()
         
@@ -92,9 +595,45 @@ class MorandiImageApp(ctk.CTk):
         self.gif_path = os.path.join(self.script_dir, "d0c438b0de1b4f779ced045eeac32c175127bf0a6930-YP8Y17_fw1200.gif")
         
         # 图片相关
-        self.current_image = None
-        self.original_image = None
+        self.current_image = None      # 当前显示的预览结果
+        self.image_size = None         # 原始分辨率尺寸
+        self.open_started = None       # 用于统计首帧时间
+        self.first_frame_ms = None
+        self.pyramid = None            # 原图的金字塔 (½, ¼, ⅛ …)
+        self.preview_source = None     # 预览代理图: 不小于显示区域的最小金字塔层级
+        self.stats_reference = None    # 估计统计量的参考层级, 预览和保存共用
+        self.level_renders = {}        # 层级尺寸 -> (层级, 参数, 渲染结果)
+        self.viewport = None           # 当前图片的缩放与平移状态
+        self.tiles = TileCache()       # 放大查看时的预览块缓存, 所有图片共用
+        self.full_loading = None       # 正在后台补全分辨率层级的图片路径
+        self.pan_origin = None         # 平移拖动的上一个位置
         self.image_path = None
+        self.pipeline = AdjustmentPipeline()
+        self.sessions = SessionList()  # 已打开的图片, 每张保留代理图、参数和历史
+        self.full_images = FullImageCache(self.FULL_IMAGE_BUDGET)   # 路径 -> 全分辨率图片
+        self.snapshots = SnapshotCache(self.HISTORY_BUDGET)
+        self.history = EditHistory(snapshots=self.snapshots)   # 当前图片的撤销 / 重做历史
+        self.pending_open = None       # 打开多张图片时, 加载完成后要切换到的路径
+        self.filmstrip_items = {}      # 会话 -> 胶片条按钮
+        self.statistics = StatisticsCache()   # (采样图, 参数) -> 直方图与均值 / 方差
+        self.frame_submitted = None    # 最近一帧的提交时间, 统计端到端延迟
+        self.profile_overlay = None    # 性能浮层 (Ctrl+Shift+P 或 MORANDI_PROFILE=1)
+        self.profile_refresh_id = None
+        self.thumbnail_disk_cache = None   # 文件夹浏览器的缩略图磁盘缓存, 首次使用时创建
+        self.export_options = EncoderOptions()   # 上次使用的编码器选项
+        self.worker = ImageWorker(self)
+        self.render_scheduler = RenderScheduler(
+            self, self.render_frame, fps=self.PREVIEW_FPS, settle_delay=self.IDLE_RENDER_DELAY
+        )
+        self.display_chain = None      # 当前预览结果的 mip 链, 用于快速重绘
+        self.displayed_size = None
+        self.fitted_previews = FittedPreviewCache()   # 按尺寸档位缓存的高质量缩放结果
+        self.resize_id = None          # 合并 <Configure> 事件的定时器
+        self.display_surface = None    # 复用 PhotoImage 的显示表面, 创建界面后初始化
+        self.idle_render_id = None
+        self.filter_thumbs = []        # (滤镜参数, 缩略图标签, 无图片时的文字)
+        self.thumbnail_level = None    # 缩略图所基于的金字塔层级, 变化时重新渲染
+        self.drop_enabled = False      # 是否已注册文件拖放 (需要 tkinterdnd2)
         
         # 窗口配置
         self.title("Morandi Image Studio")
@@ -121,6 +660,9 @@ class MorandiImageApp(ctk.CTk):
         
         # 绑定事件
         self.bind_events()
+        self.setup_drop_target()
+        if profiler.enabled:
+            self.toggle_profile_overlay()
     
     def setup_rounded_corners(self):
         """设置窗口圆角 (Windows 11)"""
@@ -222,6 +764,21 @@ class MorandiImageApp(ctk.CTk):
         )
         self.min_btn.pack(side="left", padx=5)
         
+        self.folder_btn = ctk.CTkButton(
+            self.controls_frame,
+            text="🗂",
+            width=38,
+            height=38,
+            corner_radius=19,
+            fg_color=MorandiColors.CREAM,
+            hover_color=MorandiColors.WARM_GRAY,
+            text_color=MorandiColors.TEXT_SECONDARY,
+            font=ctk.CTkFont(size=14),
+            border_width=0,
+            command=self.open_folder
+        )
+        self.folder_btn.pack(side="left", padx=5, before=self.min_btn)
+        
         self.close_btn = ctk.CTkButton(
             self.controls_frame,
             text="×",
@@ -325,13 +882,31 @@ class MorandiImageApp(ctk.CTk):
         
         # 滤镜按钮
         filters = [
-            ("🌸 玫瑰灰调", self.apply_rose_filter, MorandiColors.DUSTY_PINK),
-            ("🌿 鼠尾草绿", self.apply_sage_filter, MorandiColors.SAGE_GREEN),
-            ("💜 薰衣草紫", self.apply_lavender_filter, MorandiColors.LAVENDER),
-            ("☁️ 雾霾蓝", self.apply_dusty_blue_filter, MorandiColors.DUSTY_BLUE),
+            ("🌸 玫瑰灰调", self.apply_rose_filter, MorandiColors.DUSTY_PINK, MorandiFilters.ROSE),
+            ("🌿 鼠尾草绿", self.apply_sage_filter, MorandiColors.SAGE_GREEN, MorandiFilters.SAGE),
+            ("💜 薰衣草紫", self.apply_lavender_filter, MorandiColors.LAVENDER, MorandiFilters.LAVENDER),
+            ("☁️ 雾霾蓝", self.apply_dusty_blue_filter, MorandiColors.DUSTY_BLUE, MorandiFilters.DUSTY_BLUE),
         ]
         
-        for text, command, color in filters:
+        # 缩略图预览条: 每个滤镜作用于当前图片的效果, 点击即应用
+        thumb_strip = ctk.CTkFrame(filter_frame, fg_color="transparent")
+        thumb_strip.pack(fill="x", pady=(0, 6))
+        for column, (text, command, color, params) in enumerate(filters):
+            thumb_strip.grid_columnconfigure(column, weight=1)
+            thumb = ctk.CTkLabel(
+                thumb_strip,
+                text=text.split()[0],
+                width=self.THUMBNAIL_SIZE,
+                height=self.THUMBNAIL_SIZE,
+                corner_radius=10,
+                fg_color=color,
+                font=ctk.CTkFont(size=18)
+            )
+            thumb.grid(row=0, column=column)
+            thumb.bind("<Button-1>", lambda e, command=command: command())
+            self.filter_thumbs.append((params, thumb, thumb.cget("text")))
+        
+        for text, command, color, params in filters:
             btn = ctk.CTkButton(
                 filter_frame,
                 text=text,
@@ -467,10 +1042,20 @@ class MorandiImageApp(ctk.CTk):
             text_color=MorandiColors.TEXT_MUTED
         )
         self.image_label.pack(fill="both", expand=True)
+        self.display_surface = DisplaySurface(self.image_label)
         
         # 默认提示
         self.show_placeholder()
         
+        # 已打开图片的胶片条, 打开第一张图片后显示
+        self.filmstrip = ctk.CTkScrollableFrame(
+            self.content_frame,
+            orientation="horizontal",
+            height=self.FILMSTRIP_SIZE + 12,
+            corner_radius=10,
+            fg_color="transparent"
+        )
+        
         # 底部信息栏
         self.info_bar = ctk.CTkFrame(
             self.content_frame,
@@ -496,11 +1081,34 @@ class MorandiImageApp(ctk.CTk):
             text_color=MorandiColors.TEXT_MUTED
         )
         self.size_label.pack(side="right")
+        
+        # 直方图与亮度统计, 随每帧预览更新
+        self.stats_label = ctk.CTkLabel(
+            self.info_bar,
+            text="",
+            font=ctk.CTkFont(family="Segoe UI", size=12),
+            text_color=MorandiColors.TEXT_MUTED
+        )
+        self.stats_label.pack(side="right", padx=(0, 12))
+        width, height = self.HISTOGRAM_SIZE
+        self.histogram_canvas = tkinter.Canvas(
+            self.info_bar,
+            width=width,
+            height=height,
+            bg=MorandiColors.BG_CARD,
+            highlightthickness=0
+        )
+        self.histogram_canvas.pack(side="right", padx=(0, 8))
+        self.histogram_lines = [
+            self.histogram_canvas.create_line(0, height, width, height, fill=color)
+            for color in self.HISTOGRAM_COLORS
+        ]
     
     def show_placeholder(self):
-        """显示占位符"""
+        """显示占位符; 没有注册文件拖放时不提示拖放"""
+        hint = "拖放图片到此处\n或点击「打开图片」按钮" if self.drop_enabled else "点击「打开图片」按钮"
         self.image_label.configure(
-            text="🖼️\n\n拖放图片到此处\n或点击「打开图片」按钮",
+            text=f"🖼️\n\n{hint}",
             font=ctk.CTkFont(family="Segoe UI", size=16),
             text_color=MorandiColors.TEXT_MUTED
         )
@@ -513,6 +1121,56 @@ class MorandiImageApp(ctk.CTk):
             widget.bind("<B1-Motion>", self.do_drag)
         
         self.bind("<Escape>", lambda e: self.close_window())
+        
+        # 图片会话
+        self.bind("<Control-o>", lambda e: self.open_image())
+        self.bind("<Control-O>", lambda e: self.open_folder())
+        self.bind("<Control-w>", lambda e: self.sessions.active and self.close_session(self.sessions.active))
+        self.bind("<Control-Tab>", lambda e: self.cycle_session())
+        
+        # 性能浮层与 trace 导出 (隐藏快捷键)
+        self.bind("<Control-P>", lambda e: self.toggle_profile_overlay())
+        self.bind("<Control-E>", lambda e: self.export_trace())
+        
+        # 撤销 / 重做
+        self.bind("<Control-z>", lambda e: self.undo())
+        self.bind("<Control-y>", lambda e: self.redo())
+        self.bind("<Control-Z>", lambda e: self.redo())
+        
+        # 显示区域尺寸变化
+        self.image_frame.bind("<Configure>", self.on_display_configure)
+        
+        # 缩放与平移: 滚轮缩放, 拖动平移, 双击在适应与 1:1 之间切换
+        self.image_label.bind("<MouseWheel>", lambda e: self.zoom_at(e, ZOOM_STEP if e.delta > 0 else 1 / ZOOM_STEP))
+        self.image_label.bind("<Button-4>", lambda e: self.zoom_at(e, ZOOM_STEP))
+        self.image_label.bind("<Button-5>", lambda e: self.zoom_at(e, 1 / ZOOM_STEP))
+        self.image_label.bind("<ButtonPress-1>", self.start_pan)
+        self.image_label.bind("<B1-Motion>", self.do_pan)
+        self.image_label.bind("<Double-Button-1>", self.toggle_actual_size)
+        self.bind("<Control-Key-0>", lambda e: self.zoom_fit())
+        self.bind("<Control-Key-1>", lambda e: self.zoom_actual())
+    
+    def setup_drop_target(self):
+        """把显示区域注册为文件拖放目标 (需要可选依赖 tkinterdnd2)"""
+        if TkinterDnD is None:
+            return
+        try:
+            TkinterDnD._require(self)
+        except (RuntimeError, tkinter.TclError):
+            return
+        for widget in (self.image_frame, self.image_label):
+            widget.drop_target_register(DND_FILES)
+            widget.dnd_bind("<<Drop>>", self.on_drop)
+        self.drop_enabled = True
+        if self.pyramid is None:
+            self.show_placeholder()
+    
+    def on_drop(self, event):
+        """拖放文件: 打开其中的图片"""
+        paths = [path for path in self.tk.splitlist(event.data) if path.lower().endswith(IMAGE_EXTENSIONS)]
+        if paths:
+            self.open_paths(paths)
+        return event.action
     
     def start_drag(self, event):
         self.drag_data["x"] = event.x
@@ -525,155 +1183,719 @@ class MorandiImageApp(ctk.CTk):
     
     def close_window(self):
         if hasattr(self, 'animated_gif'):
-            self.animated_gif.stop()
+            self.animated_gif.close()
+        self.render_scheduler.cancel()
+        for after_id in (self.idle_render_id, self.resize_id):
+            if after_id is not None:
+                self.after_cancel(after_id)
+        if self.profile_refresh_id is not None:
+            self.after_cancel(self.profile_refresh_id)
+        self.worker.shutdown()
         self.destroy()
     
     # ========== 图片操作 ==========
     
     def open_image(self):
-        """打开图片"""
-        file_path = filedialog.askopenfilename(
+        """打开图片 (可多选) - 解码在后台进行"""
+        file_paths = filedialog.askopenfilenames(
             filetypes=[
                 ("图片文件", "*.png *.jpg *.jpeg *.bmp *.gif *.webp"),
                 ("所有文件", "*.*")
             ]
         )
-        if file_path:
-            self.image_path = file_path
-            self.original_image = Image.open(file_path).convert("RGB")
-            self.current_image = self.original_image.copy()
-            self.display_image()
-            self.update_info()
+        if file_paths:
+            self.open_paths(file_paths)
+    
+    def open_folder(self):
+        """在文件夹浏览器中浏览一个目录"""
+        folder = filedialog.askdirectory()
+        if folder:
+            if self.thumbnail_disk_cache is None:
+                self.thumbnail_disk_cache = ThumbnailCache()
+            FolderBrowser(self, folder, self.thumbnail_disk_cache, self.open_paths)
+    
+    def open_paths(self, file_paths):
+        """打开一组图片, 全部加入会话, 最后一张成为当前图片; 已打开的直接切换"""
+        self.pending_open = file_paths[-1]
+        for file_path in file_paths:
+            session = self.sessions.find(file_path)
+            if session:
+                if file_path == self.pending_open:
+                    self.activate_session(session)
+                continue
+            self.show_progress(f"正在打开 {os.path.basename(file_path)}…")
+            self.open_started = time.perf_counter()
+            self.worker.submit(
+                f"open:{file_path}", load_image, file_path, self.get_display_size(),
+                on_done=lambda result, file_path=file_path: self.on_image_loaded(file_path, result),
+                on_error=lambda e, file_path=file_path: self.show_error(f"打开 {os.path.basename(file_path)} 失败", e)
+            )
+    
+    def on_image_loaded(self, file_path, result):
+        """图片解码完成 (主线程): 建立会话
+        
+        全分辨率像素只放在一处: 当前图片留在金字塔中, 不激活的图片 (一次打开多张时)
+        立即裁掉金字塔的大层级, 全分辨率底图交给 LRU, 受 FULL_IMAGE_BUDGET 约束。
+        """
+        if self.sessions.find(file_path):
+            return
+        _, pyramid, image_size = result
+        session = ImageSession(file_path, pyramid, image_size, self.get_display_size(), self.snapshots)
+        self.sessions.add(session)
+        self.add_filmstrip_item(session)
+        if file_path == self.pending_open or self.sessions.active is None:
+            self.activate_session(session)
+        else:
+            base = session.release_full_resolution()
+            if base is not None:
+                self.full_images.put(file_path, base)
+    
+    # ========== 图片会话 ==========
+    
+    def activate_session(self, session):
+        """切换到某张已打开的图片: 换回代理图和参数, 不重新解码
+        
+        被切走的图片只保留预览代理, 全分辨率底图交给 FullImageCache。
+        """
+        previous = self.sessions.active
+        if previous is session:
+            return
+        if previous is not None:
+            previous.signature = self.pipeline.signature()
+            base = previous.release_full_resolution()
+            if base is not None:
+                self.full_images.put(previous.path, base)
+        
+        self.sessions.active = session
+        self.image_path = session.path
+        self.pyramid = session.pyramid
+        self.image_size = session.image_size
+        self.preview_source = session.preview_source
+        self.stats_reference = session.stats_reference
+        self.level_renders = session.level_renders
+        self.viewport = session.viewport
+        self.history = session.history
+        self.pipeline.restore(session.signature)
+        self.sync_sliders()
+        self.refresh_preview()
+        self.render_thumbnails()
+        self.update_info()
+        self.update_filmstrip()
+    
+    def close_session(self, session):
+        """关闭一张图片, 释放它的全分辨率像素和预览快照"""
+        self.filmstrip_items.pop(session).destroy()
+        self.full_images.discard(session.path)
+        session.history.discard_snapshots()
+        following = self.sessions.remove(session)
+        if following is not None:
+            self.activate_session(following)
+        elif not self.sessions:
+            self.clear_display()
+        if not self.sessions:
+            self.filmstrip.pack_forget()
+    
+    def cycle_session(self):
+        """切换到下一张已打开的图片"""
+        if len(self.sessions) > 1:
+            sessions = self.sessions.sessions
+            index = sessions.index(self.sessions.active)
+            self.activate_session(sessions[(index + 1) % len(sessions)])
+    
+    def clear_display(self):
+        """关闭最后一张图片后恢复占位状态; 放弃仍在渲染的预览、重绘和缩略图"""
+        self.render_scheduler.cancel()
+        for channel in ["preview", "display", "thumbnails"] + [
+            f"thumbnail-{index}" for index in range(len(self.filter_thumbs))
+        ]:
+            self.worker.cancel(channel)
+        for after_id in (self.idle_render_id, self.resize_id):
+            if after_id is not None:
+                self.after_cancel(after_id)
+        self.idle_render_id = self.resize_id = None
+        self.image_path = None
+        self.pyramid = None
+        self.image_size = None
+        self.preview_source = None
+        self.stats_reference = None
+        self.level_renders = {}
+        self.viewport = None
+        self.current_image = None
+        self.display_chain = None
+        self.displayed_size = None
+        self.fitted_previews.clear()
+        self.display_surface.clear()
+        self.thumbnail_level = None
+        for _, thumb, text in self.filter_thumbs:
+            thumb.configure(image=None, text=text)
+        self.show_placeholder()
+        self.info_label.configure(text="📷 暂无图片")
+        self.size_label.configure(text="")
+        self.stats_label.configure(text="")
+        width, height = self.HISTOGRAM_SIZE
+        for line in self.histogram_lines:
+            self.histogram_canvas.coords(line, 0, height, width, height)
+    
+    def add_filmstrip_item(self, session):
+        """在胶片条中加入一张图片: 单击切换, 右键关闭"""
+        thumbnail = make_thumbnail(session.stats_reference, self.FILMSTRIP_SIZE)
+        ctk_image = ctk.CTkImage(light_image=thumbnail, dark_image=thumbnail, size=thumbnail.size)
+        item = ctk.CTkButton(
+            self.filmstrip,
+            text="",
+            image=ctk_image,
+            width=self.FILMSTRIP_SIZE + 8,
+            height=self.FILMSTRIP_SIZE + 8,
+            corner_radius=8,
+            fg_color="transparent",
+            hover_color=MorandiColors.CREAM,
+            border_color=MorandiColors.TAUPE,
+            border_width=0,
+            command=lambda: self.activate_session(session)
+        )
+        item.pack(side="left", padx=3)
+        item.bind("<Button-3>", lambda e: self.close_session(session))
+        self.filmstrip_items[session] = item
+        if len(self.sessions) == 1:
+            self.filmstrip.pack(fill="x", padx=20, pady=(0, 6), before=self.info_bar)
+    
+    def update_filmstrip(self):
+        """高亮当前图片"""
+        for session, item in self.filmstrip_items.items():
+            item.configure(border_width=2 if session is self.sessions.active else 0)
     
     def save_image(self):
-        """保存图片"""
-        if self.current_image:
+        """保存图片 - 仅在保存时以原始分辨率渲染, 解码、渲染和编码在后台进行"""
+        if self.pyramid:
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".png",
                 filetypes=[
                     ("PNG", "*.png"),
-                    ("JPEG", "*.jpg"),
-                    ("BMP", "*.bmp")
+                    ("JPEG", "*.jpg *.jpeg"),
+                    ("WebP", "*.webp"),
+                    ("BMP", "*.bmp"),
+                    ("GIF", "*.gif")
                 ]
             )
-            if file_path:
-                self.current_image.save(file_path)
-    
-    def display_image(self):
-        """显示图片"""
-        if self.current_image:
-            # 计算适应显示区域的尺寸
-            display_width = self.image_frame.winfo_width() - 40
-            display_height = self.image_frame.winfo_height() - 40
-            
-            if display_width < 100:
-                display_width = 600
-            if display_height < 100:
-                display_height = 500
-            
-            # 保持宽高比缩放
-            img_ratio = self.current_image.width / self.current_image.height
-            display_ratio = display_width / display_height
-            
-            if img_ratio > display_ratio:
-                new_width = display_width
-                new_height = int(display_width / img_ratio)
-            else:
-                new_height = display_height
-                new_width = int(display_height * img_ratio)
+            if not file_path:
+                return
+            try:
+                format = format_for(file_path)
+            except ValueError as e:
+                self.show_error("保存失败", e)
+                return
+            if format not in ("BMP", "GIF"):
+                options = ExportOptionsDialog(self, format, self.export_options).show()
+                if options is None:
+                    return
+                self.export_options = options
             
-            # 缩放并显示
-            resized = self.current_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            ctk_image = ctk.CTkImage(light_image=resized, dark_image=resized, size=(new_width, new_height))
-            self.image_label.configure(image=ctk_image, text="")
-            self.image_label.image = ctk_image
+            self.show_progress(f"正在保存 {os.path.basename(file_path)}…")
+            image_path = self.image_path
+            # 金字塔底图已是全分辨率时直接使用, 不从磁盘重新解码 (文件可能已改动)
+            image = self.pyramid.base
+            if image.size != tuple(self.image_size):
+                image = self.full_images.get(image_path)
+            # 每个目标文件一个通道: 连续保存不同的文件互不取消, 同一文件以最后一次为准
+            self.worker.submit(
+                f"save:{file_path}", self.render_and_save, self.pipeline.signature(),
+                image_path, image, self.stats_reference, file_path, self.export_options,
+                on_done=lambda result: self.on_image_saved(image_path, *result),
+                on_error=lambda e: self.show_error("保存失败", e)
+            )
+    
+    def render_and_save(self, signature, image_path, image, reference, file_path, options):
+        """全分辨率渲染并编码 (后台线程); 快速打开的图片在此才解码全分辨率
+        
+        超大图片分块处理, 避免整图大小的中间副本; 写入临时文件后再替换目标文件。
+        """
+        if image is None:
+            image = load_full_image(image_path)
+        transform = self.pipeline.transform_for(image, reference=reference, signature=signature)
+        return image, export_image(image, transform, file_path, options)
+    
+    def on_image_saved(self, image_path, image, result):
+        """保存完成 (主线程), 全分辨率图片不在金字塔中时放入 LRU 供下次导出 (图片已关闭则丢弃)"""
+        session = self.sessions.find(image_path)
+        if session is not None and session.pyramid.base is not image:
+            self.full_images.put(image_path, image)
+        self.show_progress(
+            f"已保存 {os.path.basename(result.path)}  ·  {format_size(result.size)}"
+            f"  ·  编码 {result.encode_seconds * 1000:.0f} ms",
+            icon="✅"
+        )
+    
+    def get_display_size(self):
+        """获取图片显示区域的可用尺寸"""
+        display_width = self.image_frame.winfo_width() - 40
+        display_height = self.image_frame.winfo_height() - 40
+        
+        if display_width < 100:
+            display_width = 600
+        if display_height < 100:
+            display_height = 500
+        return display_width, display_height
+    
+    def refresh_preview(self, final=True):
+        """请求重新渲染预览; 滑块拖动时 final=False, 由调度器合并"""
+        if self.preview_source:
+            self.render_scheduler.request(final=final)
+    
+    def render_frame(self, final):
+        """调度器回调: 基于预览代理图在后台渲染一帧; 操作停止后的最终帧记入历史"""
+        if final:
+            self.history.record(self.pipeline.signature())
+        self.frame_submitted = time.perf_counter()
+        if self.is_zoomed():
+            self.submit_viewport_frame(final)
+            return
+        self.worker.submit(
+            "preview", self.render_preview, self.pipeline.signature(),
+            self.preview_source, self.stats_reference, self.get_display_size(), final,
+            on_done=lambda result: self.on_preview_rendered(result, final),
+            on_error=self.on_preview_failed
+        )
+    
+    def render_preview(self, signature, source, reference, display_size, final):
+        """渲染预览并缩放到显示尺寸 (后台线程); 交互帧使用较快的缩放滤镜
+        
+        直方图在估计统计量用的采样图 (不超过 STATS_SAMPLE_SIZE) 上计算, 随每帧一起交付, 不单独调度。
+        """
+        statistics = self.frame_statistics(signature, reference)
+        with profiler.span("frame.render"):
+            rendered = self.render_level(signature, source, reference)
+        if final:
+            self.history.store_snapshot(source, signature, rendered)
+        chain = MipChain(rendered)
+        resized = chain.resize(fit_size(rendered.size, display_size), final)
+        return rendered, chain, resized, statistics
+    
+    def frame_statistics(self, signature, reference):
+        """整张图片的直方图与统计量, 在采样图上计算并缓存 (后台线程)"""
+        with profiler.span("frame.statistics"):
+            sample = self.pipeline.sample_for(reference)
+            return self.statistics.get(
+                sample, signature, lambda: self.pipeline.render(sample, reference=reference, signature=signature)
+            )
+    
+    def render_level(self, signature, level, reference):
+        """渲染某个金字塔层级; 每层缓存最近一次结果, 任一阶段参数变化即失效
+        
+        撤销 / 重做到的步骤如有预览快照则直接复用。
+        """
+        cached = self.level_renders.get(level.size)
+        if cached and cached[0] is level and cached[1] == signature:
+            return cached[2]
+        rendered = self.history.snapshots.get(level, signature)
+        if rendered is None:
+            rendered = self.pipeline.render(level, reference=reference, signature=signature)
+        self.level_renders[level.size] = (level, signature, rendered)
+        return rendered
+    
+    def on_preview_rendered(self, result, final):
+        """预览渲染完成 (主线程); 高质量帧同时存入尺寸档位缓存"""
+        self.current_image, self.display_chain, resized, statistics = result
+        if final:
+            self.fitted_previews.put(self.display_chain, resized)
+        zoomed = self.is_zoomed()   # 渲染期间可能已经放大, 这时只更新缓存和统计
+        if not zoomed:
+            self.display_image(resized)
+        self.show_statistics(statistics)
+        if profiler.enabled and self.frame_submitted is not None:
+            profiler.record("frame.latency", self.frame_submitted, time.perf_counter())
+        self.render_scheduler.frame_done()
+        if self.open_started is not None:
+            self.first_frame_ms = (time.perf_counter() - self.open_started) * 1000
+            self.open_started = None
+            self.update_info()
+        if not zoomed and resized.size != fit_size(self.display_chain.base.size, self.get_display_size()):
+            self.redisplay()   # 渲染期间窗口尺寸变了
+    
+    def on_display_configure(self, event):
+        """显示区域尺寸变化: 拖动窗口边框时事件很密, 合并为每个显示刷新周期最多重绘一次"""
+        if self.resize_id is None:
+            self.resize_id = self.after(self.render_scheduler.frame_interval, self.redisplay)
+    
+    def redisplay(self):
+        """显示区域尺寸变化时快速重绘: 优先用同一档位的缓存结果, 否则从 mip 链缩放
+        
+        停止调整 IDLE_RENDER_DELAY 毫秒后再按精确尺寸做一次高质量缩放; 放大查看时重新渲染视口。
+        """
+        self.resize_id = None
+        if self.is_zoomed():
+            self.refresh_preview(final=False)
+            return
+        if self.display_chain is None:
+            return
+        size = fit_size(self.display_chain.base.size, self.get_display_size())
+        if size == self.displayed_size:
+            return
+        if self.idle_render_id is not None:
+            self.after_cancel(self.idle_render_id)
+            self.idle_render_id = None
+        fitted = self.fitted_previews.get(self.display_chain, size)
+        if fitted is not None and fitted.size == size:
+            self.display_image(fitted)
+            return
+        if fitted is None:
+            fitted = self.display_chain.resize(size)
+        self.display_image(fitted)
+        self.idle_render_id = self.after(self.IDLE_RENDER_DELAY, self.render_idle_display)
+    
+    def render_idle_display(self):
+        """调整停止后的高质量重绘
+        
+        显示区域需要的金字塔层级变了 (窗口放大超过代理图, 或缩小到更小一级) 时换用该层级重新渲染,
+        否则在后台以 LANCZOS 把当前预览缩放到精确尺寸。
+        """
+        self.idle_render_id = None
+        if self.display_chain is None or self.is_zoomed():
+            return
+        level = self.pyramid.level_for(self.get_display_size())
+        if level is not self.preview_source:
+            self.preview_source = self.sessions.active.preview_source = level
+            self.refresh_preview()
+            return
+        chain = self.display_chain
+        size = fit_size(chain.base.size, self.get_display_size())
+        self.worker.submit(
+            "display", chain.resize, size, True,
+            on_done=lambda resized: self.on_display_resized(chain, resized)
+        )
+    
+    def on_display_resized(self, chain, resized):
+        """高质量缩放完成 (主线程): 存入档位缓存, 尺寸仍然合适时显示"""
+        if chain is not self.display_chain:
+            return
+        self.fitted_previews.put(chain, resized)
+        if not self.is_zoomed() and resized.size == fit_size(chain.base.size, self.get_display_size()):
+            self.display_image(resized)
+    
+    # ========== 缩放与平移 ==========
+    
+    def is_zoomed(self):
+        """是否处于放大查看 (而不是适应显示区域)"""
+        return self.viewport is not None and self.viewport.zoom is not None
+    
+    def event_anchor(self, event):
+        """事件位置相对显示区域中心的偏移 (图片在标签中居中显示)"""
+        widget = event.widget
+        return event.x - widget.winfo_width() / 2, event.y - widget.winfo_height() / 2
+    
+    def zoom_at(self, event, factor):
+        """以鼠标位置为中心缩放"""
+        if self.viewport is None or (factor < 1 and not self.is_zoomed()):
+            return
+        self.viewport.zoom_by(factor, self.get_display_size(), self.event_anchor(event))
+        self.on_viewport_changed()
+    
+    def zoom_fit(self):
+        if self.is_zoomed():
+            self.viewport.fit()
+            self.on_viewport_changed()
+    
+    def zoom_actual(self, anchor=(0, 0)):
+        """1:1 显示; 图片比显示区域小时等同于适应显示区域"""
+        if self.viewport is None:
+            return
+        self.viewport.set_zoom(1.0, self.get_display_size(), anchor)
+        self.on_viewport_changed()
+    
+    def toggle_actual_size(self, event):
+        if self.is_zoomed():
+            self.zoom_fit()
+        else:
+            self.zoom_actual(self.event_anchor(event))
+    
+    def start_pan(self, event):
+        self.pan_origin = (event.x, event.y)
+    
+    def do_pan(self, event):
+        if not self.is_zoomed() or self.pan_origin is None:
+            return
+        dx, dy = event.x - self.pan_origin[0], event.y - self.pan_origin[1]
+        self.pan_origin = (event.x, event.y)
+        self.viewport.pan(dx, dy, self.get_display_size())
+        self.refresh_preview(final=False)
+    
+    def on_viewport_changed(self):
+        self.update_info()
+        self.refresh_preview(final=False)
+    
+    def submit_viewport_frame(self, final):
+        """放大查看时只渲染视口: 在分辨率够用的最小层级上取可见区域"""
+        display_size = self.get_display_size()
+        scale = self.viewport.scale(display_size)
+        self.ensure_full_resolution(scale)
+        box, output_size = self.viewport.region(display_size)
+        level, level_scale = choose_level(self.pyramid.levels, self.image_size, scale)
+        self.worker.submit(
+            "preview", self.render_viewport, self.pipeline.signature(),
+            level, level_scale, box, output_size, self.stats_reference, final,
+            on_done=self.on_viewport_rendered,
+            on_error=self.on_preview_failed
+        )
+    
+    def render_viewport(self, signature, level, level_scale, box, output_size, reference, final):
+        """渲染视口 (后台线程): 只对可见区域的块执行颜色变换, 变换结果按块缓存
+        
+        变换仍以 reference 估计对比度中心, 放大后的颜色与整图预览一致。
+        """
+        statistics = self.frame_statistics(signature, reference)
+        with profiler.span("frame.render"):
+            transform = self.pipeline.transform_for(level, reference=reference, signature=signature)
+            image = render_region(level, level_scale, box, output_size, transform, self.tiles, signature, final)
+        return image, statistics
+    
+    def on_viewport_rendered(self, result):
+        """视口渲染完成 (主线程)"""
+        image, statistics = result
+        if self.is_zoomed():   # 渲染期间可能已经回到适应显示区域
+            self.display_image(image)
+        self.show_statistics(statistics)
+        if profiler.enabled and self.frame_submitted is not None:
+            profiler.record("frame.latency", self.frame_submitted, time.perf_counter())
+        self.render_scheduler.frame_done()
+    
+    def ensure_full_resolution(self, scale):
+        """放大超过金字塔最大层级时, 在后台把全分辨率图片补到金字塔链首
+        
+        全分辨率图片先从 LRU 取, 没有再解码; 完成前从现有最大层级放大显示。
+        """
+        base = self.pyramid.base
+        if (base.size == tuple(self.image_size) or base.width / self.image_size[0] >= scale
+                or self.full_loading == self.image_path):
+            return
+        path = self.image_path
+        self.full_loading = path
+        self.worker.submit(
+            f"full:{path}", self.load_full_levels, path, self.full_images.get(path), base,
+            on_done=lambda levels: self.on_full_resolution(path, levels),
+            on_error=lambda e: self.on_full_resolution_failed(path, e)
+        )
+    
+    def load_full_levels(self, path, image, base):
+        """解码全分辨率图片 (已在 LRU 中则直接使用) 并生成它与 base 之间的各级 (后台线程)"""
+        if image is None:
+            image = load_full_image(path)
+        return levels_above(image, base)
+    
+    def on_full_resolution(self, path, levels):
+        """全分辨率层级就绪 (主线程); 补进当前图片的金字塔后从 LRU 移除, 图片已切走时只放入 LRU, 已关闭时丢弃"""
+        self.full_loading = None
+        session = self.sessions.active
+        if session is None or session.path != path:
+            # 图片在解码期间已关闭时丢弃, 不占用 LRU
+            if self.sessions.find(path) is not None:
+                self.full_images.put(path, levels[0])
+            return
+        pyramid_levels = session.pyramid.levels
+        if pyramid_levels[0].size != tuple(session.image_size) and levels[-1].width // 2 <= pyramid_levels[0].width:
+            pyramid_levels[:0] = levels
+            self.full_images.discard(path)
+            if self.is_zoomed():
+                self.refresh_preview(final=False)
+    
+    def on_full_resolution_failed(self, path, error):
+        self.full_loading = None
+        self.show_error(f"解码 {os.path.basename(path)} 失败", error)
+    
+    def render_thumbnails(self):
+        """在后台生成缩略图代理, 再为每个滤镜并行渲染; 源图层级不变时保留已显示的缩略图"""
+        level = self.pyramid.level_for((self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        if level is self.thumbnail_level:
+            return
+        self.thumbnail_level = level
+        self.worker.submit(
+            "thumbnails", make_thumbnail, level, self.THUMBNAIL_SIZE,
+            on_done=lambda thumbnail: self.on_thumbnail_proxy(level, thumbnail)
+        )
+    
+    def on_thumbnail_proxy(self, level, thumbnail):
+        """缩略图代理就绪 (主线程): 每个滤镜一个通道, 各自完成后立即显示"""
+        if level is not self.thumbnail_level:
+            return
+        for index, (params, thumb, _) in enumerate(self.filter_thumbs):
+            self.worker.submit(
+                f"thumbnail-{index}", render_filter_thumbnail, thumbnail, params,
+                on_done=lambda rendered, thumb=thumb: self.on_thumbnail_rendered(level, thumb, rendered)
+            )
+    
+    def on_thumbnail_rendered(self, level, thumb, rendered):
+        """单个滤镜缩略图完成 (主线程)"""
+        if level is not self.thumbnail_level:
+            return
+        ctk_image = ctk.CTkImage(light_image=rendered, dark_image=rendered, size=rendered.size)
+        thumb.configure(image=ctk_image, text="")
+    
+    def on_preview_failed(self, error):
+        self.show_error("处理失败", error)
+        self.render_scheduler.frame_done()
+    
+    def display_image(self, resized):
+        """显示已缩放到显示尺寸的图片
+        
+        Tk 的重绘本身也是空闲回调, 开启计时时用随后的 after_idle 估计重绘耗时。
+        """
+        self.display_surface.show(resized)
+        self.displayed_size = resized.size
+        if profiler.enabled:
+            start = time.perf_counter()
+            self.after_idle(lambda: profiler.record("display.repaint", start, time.perf_counter()))
+    
+    # ========== 性能分析 ==========
+    
+    def toggle_profile_overlay(self):
+        """显示或隐藏性能浮层; 显示时开启计时, 隐藏后恢复 MORANDI_PROFILE 的设定"""
+        if self.profile_overlay is not None:
+            self.after_cancel(self.profile_refresh_id)
+            self.profile_refresh_id = None
+            self.profile_overlay.destroy()
+            self.profile_overlay = None
+            profiler.enabled = ENV_ENABLED
+            return
+        profiler.enabled = True
+        self.profile_overlay = ctk.CTkLabel(
+            self.image_frame,
+            text="",
+            justify="left",
+            anchor="nw",
+            corner_radius=8,
+            fg_color=MorandiColors.BG_CARD,
+            text_color=MorandiColors.TEXT_PRIMARY,
+            font=ctk.CTkFont(family="Consolas", size=11)
+        )
+        self.profile_overlay.place(x=10, y=10)
+        self.refresh_profile_overlay()
+    
+    def refresh_profile_overlay(self):
+        """定时刷新浮层中的 p50/p95/p99 (毫秒)"""
+        self.profile_overlay.configure(text=profiler.format_summary())
+        self.profile_refresh_id = self.after(self.PROFILE_REFRESH, self.refresh_profile_overlay)
+    
+    def export_trace(self):
+        """把已记录的计时区间导出为 Chrome trace JSON"""
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            initialfile=f"morandi-trace-{time.strftime('%Y%m%d-%H%M%S')}.json",
+            filetypes=[("Chrome trace", "*.json")]
+        )
+        if file_path:
+            try:
+                count = profiler.export_chrome_trace(file_path)
+            except OSError as e:
+                self.show_error("导出 trace 失败", e)
+                return
+            self.show_progress(f"已导出 {count} 个计时区间到 {os.path.basename(file_path)}", icon="📈")
+    
+    def show_statistics(self, statistics):
+        """更新直方图 (平方根刻度) 和亮度均值 / 标准差; 只移动已有线条的坐标"""
+        width, height = self.HISTOGRAM_SIZE
+        step = 256 // self.HISTOGRAM_BINS
+        binned = [
+            [sum(histogram[i:i + step]) ** 0.5 for i in range(0, 256, step)]
+            for histogram in statistics.histograms
+        ]
+        peak = max(max(values) for values in binned) or 1.0
+        scale_x = width / (self.HISTOGRAM_BINS - 1)
+        for line, values in zip(self.histogram_lines, binned):
+            points = []
+            for i, value in enumerate(values):
+                points += (i * scale_x, height - 1 - value / peak * (height - 2))
+            self.histogram_canvas.coords(line, *points)
+        self.stats_label.configure(text=statistics.summary())
+    
+    def show_progress(self, message, icon="⏳"):
+        """在信息栏显示进度"""
+        self.info_label.configure(text=f"{icon} {message}")
+    
+    def show_error(self, message, error):
+        print(f"{message}: {error}")
+        self.show_progress(f"{message}: {error}", icon="⚠️")
     
     def update_info(self):
         """更新图片信息"""
-        if self.current_image:
+        if self.image_size:
             filename = os.path.basename(self.image_path) if self.image_path else "未命名"
-            self.info_label.configure(text=f"📷 {filename}")
-            self.size_label.configure(text=f"{self.current_image.width} × {self.current_image.height} px")
+            text = f"📷 {filename}"
+            if self.first_frame_ms is not None:
+                text += f"  ·  首帧 {self.first_frame_ms:.0f} ms"
+            self.info_label.configure(text=text)
+            size_text = f"{self.image_size[0]} × {self.image_size[1]} px"
+            if self.is_zoomed():
+                size_text += f"  ·  {self.viewport.zoom * 100:.0f}%"
+            self.size_label.configure(text=size_text)
     
     def reset_image(self):
         """重置图片"""
-        if self.original_image:
-            self.current_image = self.original_image.copy()
-            self.brightness_slider.set(1.0)
-            self.contrast_slider.set(1.0)
-            self.saturation_slider.set(1.0)
-            self.display_image()
+        self.pipeline.reset()
+        self.brightness_slider.set(1.0)
+        self.contrast_slider.set(1.0)
+        self.saturation_slider.set(1.0)
+        self.refresh_preview()
+    
+    def undo(self):
+        """撤销一步"""
+        self.restore_step(self.history.undo())
+    
+    def redo(self):
+        """重做一步"""
+        self.restore_step(self.history.redo())
+    
+    def restore_step(self, signature):
+        """恢复历史中的参数并同步滑块 (set 不会触发滑块回调)"""
+        if signature is None or not self.pyramid:
+            return
+        self.pipeline.restore(signature)
+        self.sync_sliders()
+        self.refresh_preview()
+    
+    def sync_sliders(self):
+        """滑块位置跟随当前参数"""
+        self.brightness_slider.set(self.pipeline.brightness)
+        self.contrast_slider.set(self.pipeline.contrast)
+        self.saturation_slider.set(self.pipeline.saturation)
     
     # ========== 莫兰迪滤镜 ==========
     
-    def apply_morandi_tone(self, image, r_shift, g_shift, b_shift, saturation=0.7):
-        """应用莫兰迪色调"""
-        # 降低饱和度
-        enhancer = ImageEnhance.Color(image)
-        img = enhancer.enhance(saturation)
-        
-        # 调整色调
-        r, g, b = img.split()
-        r = r.point(lambda x: min(255, x + r_shift))
-        g = g.point(lambda x: min(255, x + g_shift))
-        b = b.point(lambda x: min(255, x + b_shift))
-        
-        return Image.merge('RGB', (r, g, b))
+    def set_filter(self, params):
+        """设置调整图中的滤镜阶段"""
+        if self.pyramid:
+            self.pipeline.filter = params
+            self.refresh_preview()
     
     def apply_rose_filter(self):
         """玫瑰灰调滤镜"""
-        if self.original_image:
-            self.current_image = self.apply_morandi_tone(
-                self.original_image.copy(), 15, -5, -10, 0.65
-            )
-            self.display_image()
+        self.set_filter(MorandiFilters.ROSE)
     
     def apply_sage_filter(self):
         """鼠尾草绿滤镜"""
-        if self.original_image:
-            self.current_image = self.apply_morandi_tone(
-                self.original_image.copy(), -10, 10, -5, 0.6
-            )
-            self.display_image()
+        self.set_filter(MorandiFilters.SAGE)
     
     def apply_lavender_filter(self):
         """薰衣草紫滤镜"""
-        if self.original_image:
-            self.current_image = self.apply_morandi_tone(
-                self.original_image.copy(), 5, -5, 15, 0.6
-            )
-            self.display_image()
+        self.set_filter(MorandiFilters.LAVENDER)
     
     def apply_dusty_blue_filter(self):
         """雾霾蓝滤镜"""
-        if self.original_image:
-            self.current_image = self.apply_morandi_tone(
-                self.original_image.copy(), -10, 0, 15, 0.55
-            )
-            self.display_image()
+        self.set_filter(MorandiFilters.DUSTY_BLUE)
     
     # ========== 图片调整 ==========
     
     def adjust_brightness(self, value):
         """调整亮度"""
-        if self.original_image:
-            enhancer = ImageEnhance.Brightness(self.current_image)
-            self.current_image = enhancer.enhance(value)
-            self.display_image()
+        self.pipeline.brightness = value
+        self.refresh_preview(final=False)
     
     def adjust_contrast(self, value):
         """调整对比度"""
-        if self.original_image:
-            enhancer = ImageEnhance.Contrast(self.current_image)
-            self.current_image = enhancer.enhance(value)
-            self.display_image()
+        self.pipeline.contrast = value
+        self.refresh_preview(final=False)
     
     def adjust_saturation(self, value):
         """调整饱和度"""
-        if self.original_image:
-            enhancer = ImageEnhance.Color(self.current_image)
-            self.current_image = enhancer.enhance(value)
-            self.display_image()
+        self.pipeline.saturation = value
+        self.refresh_preview(final=False)
 
 
 def main():